@@ -1,40 +1,215 @@
-from google import genai
-
-class RAG:
-    def __init__(self, api_key, model="gemini-1.5-flash", max_tokens=1000):
-        """
-        Initialize the RAG (Retrieval-Augmented Generation) pipeline with Google Gemini.
-        """
-        self.client = genai.Client(api_key=api_key)
-        self.model = model
-        self.max_tokens = max_tokens
-
-    def query_gemini(self, context, query):
-        prompt = f"Context: {context}\n\nQuestion: {query}\nAnswer:"
-
-        # Send the request and get the response
-        response = self._send_request(prompt)
-        if response:
-            return response.text.strip()  # Stripping any extra whitespace
-        return None
-
-    def _send_request(self, prompt):
-        """
-        Send a request to the Gemini model API with the given prompt.
-        """
-        try:
-            # Send the request to generate content using the Gemini model
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=prompt
-            )
-            return response
-        except Exception as e:
-            print(f"Error querying the model: {e}")
-            return None
-
-    def generate_answer(self, query, context):
-        """
-        Generate an answer using the RAG pipeline by querying Gemini.
-        """
-        return self.query_gemini(context, query)
+import time
+import random
+import asyncio
+import hashlib
+import logging
+from instrumentation import span, increment, observe
+
+logger = logging.getLogger(__name__)
+
+class RAG:
+    def __init__(self, api_key, model="gemini-1.5-flash", max_tokens=1000, client=None, cache=None,
+                 request_timeout=60, max_retries=4, backoff=1.0):
+        """
+        Initialize the RAG (Retrieval-Augmented Generation) pipeline with Google Gemini.
+
+        `client` replaces the genai client (e.g. with a fake in tests) and
+        `cache` is an optional AnswerCache consulted before every request.
+        `max_tokens` caps the length of every generated answer. The async path
+        gives up on a request after `request_timeout` seconds and retries
+        rate-limited or timed-out requests up to `max_retries` times with
+        exponential backoff starting at `backoff` seconds.
+        """
+        self.api_key = api_key
+        self.model = model
+        self.max_tokens = max_tokens
+        self.cache = cache
+        self.request_timeout = request_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._client = client
+
+    @property
+    def client(self):
+        # google.genai is slow to import, so the client is created on first use.
+        if self._client is None:
+            from google import genai
+
+            self._client = genai.Client(api_key=self.api_key)
+        return self._client
+
+    def query_gemini(self, context, query, chunk_ids=None):
+        """
+        `chunk_ids` identifies the retrieved context for the answer cache; the
+        context text itself is used when it is not given.
+        """
+        if self.cache is not None:
+            cache_ids = self._cache_ids(context, chunk_ids)
+            cached = self.cache.get(self.model, query, cache_ids)
+            if cached is not None:
+                increment("answer_cache_hits")
+                return cached
+
+        prompt = self._build_prompt(context, query)
+
+        # Send the request and get the response
+        response = self._send_request(prompt)
+        if response:
+            answer = response.text.strip()  # Stripping any extra whitespace
+            if self.cache is not None:
+                self.cache.put(self.model, query, cache_ids, answer)
+            return answer
+        return None
+
+    def stream_answer(self, context, query, chunk_ids=None):
+        """
+        Yield the answer text in pieces as Gemini generates it. A cached answer
+        is yielded in one piece. The complete answer is stored in the cache
+        once the stream finishes.
+        """
+        cache_ids = self._cache_ids(context, chunk_ids)
+        if self.cache is not None:
+            cached = self.cache.get(self.model, query, cache_ids)
+            if cached is not None:
+                increment("answer_cache_hits")
+                yield cached
+                return
+
+        pieces = []
+        start = time.perf_counter()
+        try:
+            for chunk in self.client.models.generate_content_stream(
+                model=self.model,
+                contents=self._build_prompt(context, query),
+                config=self._generation_config()
+            ):
+                if chunk.text:
+                    if not pieces:
+                        observe("generate_first_token", (time.perf_counter() - start) * 1000)
+                    pieces.append(chunk.text)
+                    yield chunk.text
+        except Exception as e:
+            increment("generate_errors")
+            logger.error("Error querying the model: %s", e)
+            return
+        finally:
+            observe("generate", (time.perf_counter() - start) * 1000)
+
+        if pieces and self.cache is not None:
+            self.cache.put(self.model, query, cache_ids, "".join(pieces).strip())
+
+    @staticmethod
+    def _build_prompt(context, query):
+        return f"Context: {context}\n\nQuestion: {query}\nAnswer:"
+
+    def _generation_config(self):
+        return {"max_output_tokens": self.max_tokens}
+
+    @staticmethod
+    def _cache_ids(context, chunk_ids):
+        if chunk_ids is not None:
+            return chunk_ids
+        return ["context:" + hashlib.sha256(context.encode("utf-8")).hexdigest()]
+
+    def _send_request(self, prompt):
+        """
+        Send a request to the Gemini model API with the given prompt.
+        """
+        try:
+            # Send the request to generate content using the Gemini model
+            with span("generate"):
+                response = self.client.models.generate_content(
+                    model=self.model,
+                    contents=prompt,
+                    config=self._generation_config()
+                )
+            return response
+        except Exception as e:
+            increment("generate_errors")
+            logger.error("Error querying the model: %s", e)
+            return None
+
+    async def _asend_request(self, prompt):
+        """
+        Async counterpart of _send_request with a per-request timeout and
+        exponential backoff on rate limits and timeouts.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                with span("generate"):
+                    return await asyncio.wait_for(
+                        self.client.aio.models.generate_content(
+                            model=self.model,
+                            contents=prompt,
+                            config=self._generation_config()
+                        ),
+                        timeout=self.request_timeout
+                    )
+            except Exception as e:
+                retryable = isinstance(e, asyncio.TimeoutError) or self._is_rate_limit(e)
+                if not retryable or attempt == self.max_retries:
+                    increment("generate_errors")
+                    logger.error("Error querying the model: %r", e)
+                    return None
+                increment("generate_retries")
+                delay = self.backoff * (2 ** attempt)
+                await asyncio.sleep(delay + random.uniform(0, delay / 2))
+        return None
+
+    @staticmethod
+    def _is_rate_limit(error):
+        return (getattr(error, "code", None) == 429
+                or getattr(error, "status", None) == "RESOURCE_EXHAUSTED"
+                or "429" in str(error))
+
+    async def agenerate_answer(self, query, context=None, retriever=None, chunk_ids=None):
+        """
+        Generate an answer asynchronously. When `retriever` is given it is
+        called in a worker thread as retriever(query) and must return a
+        (context, chunk_ids) pair.
+        """
+        if retriever is not None:
+            context, chunk_ids = await asyncio.to_thread(retriever, query)
+        context = context or ""
+
+        if self.cache is not None:
+            cache_ids = self._cache_ids(context, chunk_ids)
+            cached = self.cache.get(self.model, query, cache_ids)
+            if cached is not None:
+                increment("answer_cache_hits")
+                return cached
+
+        response = await self._asend_request(self._build_prompt(context, query))
+        if response:
+            answer = response.text.strip()
+            if self.cache is not None:
+                self.cache.put(self.model, query, cache_ids, answer)
+            return answer
+        return None
+
+    async def agenerate_answers(self, queries, contexts=None, retriever=None, concurrency=4, chunk_ids=None):
+        semaphore = asyncio.Semaphore(concurrency)
+        contexts = contexts if contexts is not None else [None] * len(queries)
+        chunk_ids = chunk_ids if chunk_ids is not None else [None] * len(queries)
+
+        async def answer(query, context, ids):
+            async with semaphore:
+                return await self.agenerate_answer(query, context=context, retriever=retriever, chunk_ids=ids)
+
+        return await asyncio.gather(*(answer(query, context, ids)
+                                      for query, context, ids in zip(queries, contexts, chunk_ids)))
+
+    def generate_answers(self, queries, contexts=None, retriever=None, concurrency=4, chunk_ids=None):
+        """
+        Answer many queries at once, with at most `concurrency` retrievals and
+        generations in flight. `chunk_ids` gives the cache identity of each
+        context, as in query_gemini. Returns the answers in query order;
+        failed queries give None.
+        """
+        return asyncio.run(self.agenerate_answers(queries, contexts, retriever, concurrency, chunk_ids))
+
+    def generate_answer(self, query, context):
+        """
+        Generate an answer using the RAG pipeline by querying Gemini.
+        """
+        return self.query_gemini(context, query)
@@ -0,0 +1,219 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    query = re.sub(r'\s+', ' ', query.lower()).strip()
+    return query.rstrip("?.! ")
+
+
+class AnswerCache:
+    """
+    Cache of generated answers keyed by (model, normalized query, retrieved chunk IDs).
+
+    With `semantic_threshold` and an `embedder`, a query that misses the exact
+    key can still reuse an answer whose query embedding is within that cosine
+    distance, as long as it was generated from the same model and the same
+    retrieved chunks. Query embeddings are kept as rows of one matrix and
+    entries are indexed by context, so a semantic lookup is one product over
+    the entries of that context. Entries expire after `ttl` seconds and the
+    least recently used ones are evicted beyond `max_entries`.
+
+    When `path` is given, every new answer is appended as one JSON line to
+    `path`.log, and the log is folded into the `path` snapshot once it holds
+    `max_entries` records, so persisting costs constant time per answer.
+    """
+
+    def __init__(self, path=None, ttl=24 * 3600, max_entries=1000, semantic_threshold=None, embedder=None):
+        self.path = path
+        self.log_path = path + ".log" if path else None
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.semantic_threshold = semantic_threshold
+        self.embedder = embedder
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._rows = {}
+        self._free_rows = []
+        self._by_context = {}
+        self._log = None
+        self._log_records = 0
+        if path:
+            self._load()
+            self._log = open(self.log_path, "a", encoding="utf-8")
+
+    def _load(self):
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                for key, entry in json.load(f):
+                    self._insert(key, entry)
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-write.
+                        continue
+                    self._insert(record["key"], record["entry"])
+                    self._log_records += 1
+        for key in [key for key, entry in self.entries.items() if self._expired(entry)]:
+            self._remove(key)
+
+    @staticmethod
+    def context_key(model, chunk_ids):
+        ids = "\n".join(sorted(str(chunk_id) for chunk_id in chunk_ids))
+        return hashlib.sha256(f"{model}\n{ids}".encode("utf-8")).hexdigest()
+
+    def key(self, model, query, chunk_ids):
+        context_key = self.context_key(model, chunk_ids)
+        return hashlib.sha256(f"{context_key}\n{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+    def _expired(self, entry):
+        return self.ttl is not None and time.time() - entry["created"] > self.ttl
+
+    def _embed(self, query):
+        vector = self.embedder.encode([normalize_query(query)], use_cache=False)[0].astype(np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _semantic_enabled(self):
+        return self.semantic_threshold is not None and self.embedder is not None
+
+    def _insert(self, key, entry):
+        """Add or replace an entry; its "embedding", if any, moves into the vector matrix."""
+        self._remove(key)
+        entry = dict(entry)
+        embedding = entry.pop("embedding", None)
+        self.entries[key] = entry
+        self._by_context.setdefault(entry["context"], set()).add(key)
+        if embedding is not None:
+            embedding = np.asarray(embedding, dtype=np.float32)
+            if self._vectors is None:
+                self._vectors = np.zeros((max(self.max_entries, 1), len(embedding)), dtype=np.float32)
+            if self._free_rows:
+                row = self._free_rows.pop()
+            else:
+                row = len(self._rows)
+                if row == len(self._vectors):
+                    self._vectors = np.concatenate([self._vectors, np.zeros_like(self._vectors)])
+            self._vectors[row] = embedding
+            self._rows[key] = row
+        while len(self.entries) > self.max_entries:
+            self._remove(next(iter(self.entries)))
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_context.get(entry["context"])
+        keys.discard(key)
+        if not keys:
+            del self._by_context[entry["context"]]
+        row = self._rows.pop(key, None)
+        if row is not None:
+            self._free_rows.append(row)
+
+    def get(self, model, query, chunk_ids):
+        """Return the cached answer for this query and context, or None."""
+        key = self.key(model, query, chunk_ids)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and self._expired(entry):
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry["answer"]
+
+        if self._semantic_enabled():
+            context_key = self.context_key(model, chunk_ids)
+            query_vector = self._embed(query)
+            with self._lock:
+                candidates = [candidate for candidate in self._by_context.get(context_key, ())
+                              if candidate in self._rows and not self._expired(self.entries[candidate])]
+                if candidates:
+                    rows = np.array([self._rows[candidate] for candidate in candidates])
+                    distances = 1.0 - self._vectors[rows] @ query_vector
+                    best = int(np.argmin(distances))
+                    if distances[best] <= self.semantic_threshold:
+                        self.entries.move_to_end(candidates[best])
+                        self.semantic_hits += 1
+                        return self.entries[candidates[best]]["answer"]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, model, query, chunk_ids, answer):
+        if answer is None:
+            return
+        embedding = self._embed(query).tolist() if self._semantic_enabled() else None
+        with self._lock:
+            key = self.key(model, query, chunk_ids)
+            entry = {
+                "context": self.context_key(model, chunk_ids),
+                "query": query,
+                "answer": answer,
+                "created": time.time(),
+                "embedding": embedding,
+            }
+            self._insert(key, entry)
+            if self._log is not None:
+                self._log.write(json.dumps({"key": key, "entry": entry}) + "\n")
+                self._log.flush()
+                self._log_records += 1
+                if self._log_records >= self.max_entries:
+                    self._save()
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def close(self):
+        with self._lock:
+            if self._log is not None:
+                self._save()
+                self._log.close()
+                self._log = None
+
+    def _save(self):
+        """Write every entry to the snapshot and start an empty log."""
+        if not self.path:
+            return
+        items = []
+        for key, entry in self.entries.items():
+            row = self._rows.get(key)
+            items.append([key, {**entry, "embedding": self._vectors[row].tolist() if row is not None else None}])
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(items, f)
+        os.replace(tmp_path, self.path)
+        if self._log is not None:
+            # Replaying records already in the snapshot only rewrites the same
+            # entries, so a crash before this truncation loses nothing.
+            self._log.truncate(0)
+            self._log.seek(0)
+        self._log_records = 0
+
+    def stats(self):
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+        }
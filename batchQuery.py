@@ -0,0 +1,127 @@
+import re
+import json
+import time
+import logging
+from typing import List, Dict
+from instrumentation import span, increment
+
+logger = logging.getLogger(__name__)
+
+
+class OfflineResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class OfflineModels:
+    """Answers with the first sentence of the prompt's context, without calling any model."""
+
+    @staticmethod
+    def _answer(contents):
+        context = contents.split("Context:", 1)[-1].split("Question:", 1)[0].strip()
+        return OfflineResponse(context.split(". ", 1)[0] or "No context.")
+
+    def generate_content(self, model, contents, config=None):
+        return self._answer(contents)
+
+    def generate_content_stream(self, model, contents, config=None):
+        for piece in re.findall(r"\S+\s*", self._answer(contents).text):
+            yield OfflineResponse(piece)
+
+
+class OfflineAioModels:
+    async def generate_content(self, model, contents, config=None):
+        return OfflineModels._answer(contents)
+
+
+class OfflineClient:
+    """Stands in for the genai client so batch runs can be checked offline."""
+
+    def __init__(self):
+        self.models = OfflineModels()
+        self.aio = type("OfflineAio", (), {})()
+        self.aio.models = OfflineAioModels()
+
+
+def load_queries(path: str) -> List[Dict]:
+    """
+    Read a queries file: a JSON list of objects with a "question" and
+    optionally a "query_id", or one such object per line. Queries without an
+    ID are numbered by position.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        items = json.loads(text)
+    else:
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [{**item, "query_id": str(item.get("query_id", i))} for i, item in enumerate(items)]
+
+
+def select_context(results: List[Dict], similarity_threshold: float, lexical_threshold: float) -> List[Dict]:
+    """Keep results within the distance threshold or with a strong lexical match."""
+    return [
+        item for item in results
+        if item["score"] <= similarity_threshold or item.get("lexical_score", 0.0) >= lexical_threshold
+    ]
+
+
+def collect_references(items: List[Dict]) -> Dict:
+    sections = {item["section"] for item in items if item.get("section") is not None}
+    pages = {str(item["page"]) for item in items if item.get("page") is not None}
+    return {"sections": sorted(sections), "pages": sorted(pages)}
+
+
+def run_batch(queries: List[Dict], vector_storage, rag, prompt_builder, output_path: str, top_k: int = 5,
+              similarity_threshold: float = 0.9, lexical_threshold: float = 5.0, concurrency: int = 8,
+              search_options: Dict = None) -> Dict:
+    """
+    Answer `queries` (as returned by load_queries) and write one JSON line per
+    query to `output_path`, in input order.
+
+    All questions are encoded in one embedder call and searched with one
+    store query; the answers are then generated by `rag` with at most
+    `concurrency` requests in flight. Pass a RAG built on OfflineClient to
+    run without the model. Returns the throughput summary.
+    """
+    questions = [item["question"] for item in queries]
+    start = time.perf_counter()
+    results = vector_storage.search_batch(questions, top_k, **(search_options or {}))
+
+    packed = []
+    for item_results in results:
+        packed.append(prompt_builder.pack(select_context(item_results, similarity_threshold, lexical_threshold)))
+    retrieval_seconds = time.perf_counter() - start
+
+    with span("batch_generate"):
+        answers = rag.generate_answers(questions, contexts=[p["context"] for p in packed], concurrency=concurrency,
+                                       chunk_ids=[p["chunk_ids"] for p in packed])
+    total_seconds = time.perf_counter() - start
+
+    failed = 0
+    with open(output_path, "w", encoding="utf-8") as f:
+        for item, question, pack, answer in zip(queries, questions, packed, answers):
+            failed += answer is None
+            record = {
+                "query_id": item["query_id"],
+                "question": question,
+                "answer": answer,
+                "references": collect_references(pack["items"]),
+                "chunk_ids": pack["chunk_ids"],
+                "context_tokens": pack["tokens"],
+            }
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    increment("batch_queries", len(queries))
+
+    summary = {
+        "queries": len(queries),
+        "failed": failed,
+        "retrieval_seconds": round(retrieval_seconds, 3),
+        "generation_seconds": round(total_seconds - retrieval_seconds, 3),
+        "total_seconds": round(total_seconds, 3),
+        "queries_per_second": round(len(queries) / total_seconds, 2) if total_seconds else 0.0,
+    }
+    logger.info("Answered %d queries (%d failed) in %.2fs: %.2f queries/s (retrieval %.2fs, generation %.2fs)",
+                summary["queries"], failed, total_seconds, summary["queries_per_second"], retrieval_seconds,
+                summary["generation_seconds"])
+    return summary
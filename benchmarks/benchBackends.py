@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from numpyStore import NumpyCollection
+from evaluate import latency_summary
+
+
+def open_chroma(path):
+    import chromadb
+
+    client = chromadb.PersistentClient(path=path)
+    return client.get_or_create_collection(name="history_chunks")
+
+
+def fill(collection, ids, documents, embeddings, metadatas, batch_size=5000):
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        collection.add(ids=ids[start:end], documents=documents[start:end],
+                       embeddings=embeddings[start:end].tolist(), metadatas=metadatas[start:end])
+
+
+def measure(label, open_collection, queries, top_k, batch_size):
+    start = time.perf_counter()
+    collection = open_collection()
+    collection.count()
+    open_ms = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        collection.query(query_embeddings=[query.tolist()], n_results=top_k,
+                         include=["documents", "metadatas", "distances"])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    for begin in range(0, len(queries), batch_size):
+        collection.query(query_embeddings=queries[begin:begin + batch_size].tolist(), n_results=top_k,
+                         include=["documents", "metadatas", "distances"])
+    batched = len(queries) / (time.perf_counter() - start)
+
+    summary = latency_summary(latencies)
+    print(f"{label:<16} open {open_ms:8.1f} ms | query p50 {summary['p50_ms']:7.3f} ms "
+          f"p95 {summary['p95_ms']:7.3f} ms | batched {batched:9.1f} queries/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Chroma and the memory-mapped NumPy backend.")
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(args.chunks, args.dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    ids = [str(i) for i in range(args.chunks)]
+    documents = [f"chunk {i}" for i in range(args.chunks)]
+    metadatas = [{"chunkId": str(i), "page": i % 300, "section": f"{i % 12}.{i % 7}"} for i in range(args.chunks)]
+
+    print(f"{args.chunks} chunks x {args.dim} dims, {args.queries} queries, top_k={args.top_k}")
+    with tempfile.TemporaryDirectory() as directory:
+        for dtype in ("float32", "float16"):
+            path = os.path.join(directory, f"numpy_{dtype}")
+            fill(NumpyCollection(path, dtype=dtype), ids, documents, embeddings, metadatas, batch_size=args.chunks)
+            measure(f"numpy {dtype}", lambda: NumpyCollection(path, dtype=dtype), queries, args.top_k, args.batch_size)
+
+        if not args.skip_chroma:
+            path = os.path.join(directory, "chroma")
+            fill(open_chroma(path), ids, documents, embeddings, metadatas)
+            measure("chroma", lambda: open_chroma(path), queries, args.top_k, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nltk.tokenize import sent_tokenize, word_tokenize
+from chunker import StreamingChunker
+
+
+def legacy_chunk(sentences, chunk_size):
+    # The original Preprocessor.chunk_and_annotate_text loop, which re-tokenizes
+    # the whole candidate chunk for every sentence.
+    chunks = []
+    current_chunk = ""
+    for sentence in sentences:
+        if len(word_tokenize(current_chunk + " " + sentence)) <= chunk_size:
+            current_chunk += " " + sentence
+        else:
+            if current_chunk.strip():
+                chunks.append(current_chunk.strip())
+            current_chunk = sentence.strip()
+    if current_chunk.strip():
+        chunks.append(current_chunk.strip())
+    return chunks
+
+
+def synthetic_text(n_sentences, seed=0):
+    rng = random.Random(seed)
+    words = ["the", "British", "colonial", "government", "introduced", "plantation", "agriculture",
+             "in", "Sri", "Lanka", "during", "1833", "reforms", "Colebrooke", "Cameron", "coffee",
+             "tea", "railway", "Kandy", "Colombo", "and", "of", "was", "a", "new", "system"]
+    sentences = []
+    for _ in range(n_sentences):
+        length = rng.randint(6, 30)
+        sentence = " ".join(rng.choice(words) for _ in range(length))
+        sentences.append(sentence[0].upper() + sentence[1:] + ".")
+    return " ".join(sentences)
+
+
+def measure(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare chunking throughput of the legacy and streaming chunkers.")
+    parser.add_argument("--file", help="Plain text file to chunk. A synthetic text is used when omitted.")
+    parser.add_argument("--sentences", type=int, default=5000)
+    parser.add_argument("--chunk-size", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, "r", encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = synthetic_text(args.sentences)
+
+    sentences = sent_tokenize(text)
+    total_tokens = sum(len(word_tokenize(sentence)) for sentence in sentences)
+
+    legacy, legacy_time = measure(lambda: legacy_chunk(sentences, args.chunk_size))
+    streamed, streamed_time = measure(lambda: list(StreamingChunker(args.chunk_size).chunk(sentences)))
+
+    print(f"Sentences: {len(sentences)}, tokens: {total_tokens}, chunk size: {args.chunk_size}")
+    print(f"Legacy chunker:    {legacy_time:.3f}s ({total_tokens / legacy_time:,.0f} tokens/sec)")
+    print(f"Streaming chunker: {streamed_time:.3f}s ({total_tokens / streamed_time:,.0f} tokens/sec)")
+    print(f"Speed-up: {legacy_time / streamed_time:.1f}x")
+    print(f"Identical output: {legacy == streamed} ({len(streamed)} chunks)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from numpyStore import NumpyCollection
+from evaluate import latency_summary
+
+
+def synthetic_corpus(rng, chunks, dim, clusters):
+    """Unit vectors grouped around topic centers, closer to real embeddings than isotropic noise."""
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    embeddings = centers[rng.integers(clusters, size=chunks)] + 0.6 * rng.normal(size=(chunks, dim)).astype(np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def recall(found, truth):
+    return float(np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(found, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory and recall of int8 / PQ compressed NumPy search.")
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    embeddings = synthetic_corpus(rng, args.chunks, args.dim, args.clusters)
+    queries = embeddings[rng.choice(args.chunks, args.queries, replace=False)]
+    queries = queries + 0.3 * rng.normal(size=queries.shape).astype(np.float32)
+    ids = [str(i) for i in range(args.chunks)]
+    documents = [f"chunk {i}" for i in range(args.chunks)]
+    metadatas = [{"chunkId": str(i)} for i in range(args.chunks)]
+
+    print(f"{args.chunks} chunks x {args.dim} dims, {args.queries} queries, top_k={args.top_k}")
+    with tempfile.TemporaryDirectory() as directory:
+        exact = NumpyCollection(os.path.join(directory, "exact"))
+        exact.add(ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+        truth = exact.query(queries, n_results=args.top_k, include=[])["ids"]
+        print(f"{'exact float32':<22} scanned {exact.memory_footprint()['float32_bytes'] / 2 ** 20:8.2f} MB")
+
+        for compression in ("int8", "pq"):
+            path = os.path.join(directory, compression)
+            start = time.perf_counter()
+            NumpyCollection(path, compression=compression).add(ids, documents=documents, embeddings=embeddings,
+                                                               metadatas=metadatas)
+            build_s = time.perf_counter() - start
+
+            for rerank_factor in (1, args.rerank_factor):
+                collection = NumpyCollection(path, compression=compression, rerank_factor=rerank_factor)
+                latencies, found = [], []
+                for query in queries:
+                    start = time.perf_counter()
+                    found.extend(collection.query([query], n_results=args.top_k, include=[])["ids"])
+                    latencies.append((time.perf_counter() - start) * 1000)
+                footprint = collection.memory_footprint()
+                scanned = (footprint["codes_bytes"] + footprint["quantizer_bytes"]) / 2 ** 20
+                summary = latency_summary(latencies)
+                print(f"{compression:<5} rerank x{rerank_factor:<2}        scanned {scanned:8.2f} MB "
+                      f"({footprint['float32_bytes'] / 2 ** 20 / scanned:5.1f}x smaller) | "
+                      f"recall@{args.top_k} {recall(found, truth):.3f} | p50 {summary['p50_ms']:7.3f} ms | "
+                      f"build {build_s:5.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from itertools import islice
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedder import Embedder, load_model
+from preprocessor import read_chunks
+
+
+def load_chunks(path, limit):
+    if path and os.path.exists(path):
+        return [chunk for chunk, _ in islice(read_chunks(path), limit)]
+    rng = random.Random(0)
+    words = ["British", "colonial", "government", "plantation", "railway", "Kandy", "Colombo", "reform",
+             "coffee", "tea", "irrigation", "Mahaweli", "education", "missionary", "school", "the", "of", "and"]
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(10, 120))) for _ in range(limit)]
+
+
+def throughput(label, chunks, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<36} {elapsed:7.2f}s {len(chunks) / elapsed:9.1f} chunks/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure embedding throughput on CPU.")
+    parser.add_argument("--chunks", default="preprocessed_data/chunks.jsonl")
+    parser.add_argument("--limit", type=int, default=2000)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--batch-sizes", default="16,32,64,128")
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.chunks, args.limit)
+    model = load_model(args.model)
+    model.encode(chunks[:8], show_progress_bar=False)
+
+    print(f"{len(chunks)} chunks, model {args.model}")
+    throughput("SentenceTransformer.encode default", chunks, lambda: model.encode(chunks, show_progress_bar=False))
+    for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+        embedder = Embedder(args.model, batch_size=batch_size)
+        throughput(f"Embedder batch_size={batch_size}", chunks, lambda: embedder.encode(chunks))
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        embedder = Embedder(args.model, cache_path=os.path.join(cache_dir, "embedding_cache.sqlite"))
+        throughput("Embedder with cache (cold)", chunks, lambda: embedder.encode(chunks))
+        throughput("Embedder with cache (warm)", chunks, lambda: embedder.encode(chunks))
+        embedder.cache.close()
+
+
+if __name__ == "__main__":
+    main()
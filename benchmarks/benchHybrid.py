@@ -0,0 +1,53 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vectorStorage import VectorStore
+from evaluate import is_relevant
+
+
+def recall_at_k(store, items, top_k, **search_options):
+    hits = 0
+    for item in items:
+        results = store.search(item["question"], top_k=top_k, **search_options)
+        hits += any(is_relevant(result, item.get("references", {})) for result in results)
+    return hits / len(items) if items else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare dense and hybrid retrieval recall over labeled queries.")
+    parser.add_argument("--db", default="./chroma")
+    parser.add_argument("--queries", default="rawInput/queries.json")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--dense-weight", type=float, default=1.0)
+    parser.add_argument("--lexical-weight", type=float, default=1.0)
+    args = parser.parse_args()
+
+    with open(args.queries, "r") as f:
+        items = json.load(f)
+    store = VectorStore(args.db)
+    if not len(store.lexical_index):
+        store.rebuild_lexical_index()
+
+    timings = []
+    for item in items:
+        start = time.perf_counter()
+        store.lexical_index.search(item["question"], args.top_k * 4)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+
+    dense = recall_at_k(store, items, args.top_k, mode="dense")
+    hybrid = recall_at_k(store, items, args.top_k, mode="hybrid",
+                         dense_weight=args.dense_weight, lexical_weight=args.lexical_weight)
+    print(f"{len(items)} queries, {len(store.lexical_index)} indexed chunks, top_k={args.top_k}")
+    print(f"Lexical search latency: mean {sum(timings) / len(timings):.3f} ms, max {timings[-1]:.3f} ms")
+    print(f"Recall@{args.top_k} dense:  {dense:.2f}")
+    print(f"Recall@{args.top_k} hybrid: {hybrid:.2f}")
+
+
+if __name__ == "__main__":
+    main()
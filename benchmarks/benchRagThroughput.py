@@ -0,0 +1,89 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from RAG import RAG
+from batchQuery import OfflineClient, OfflineModels
+
+
+class RateLimitError(Exception):
+    code = 429
+
+
+class FakeModels(OfflineModels):
+    """The offline model with a fixed latency and random rate limiting, to stand in for the Gemini endpoint."""
+
+    def __init__(self, latency, rate_limit_probability, seed=0):
+        self.latency = latency
+        self.rate_limit_probability = rate_limit_probability
+        self.rng = random.Random(seed)
+        self.requests = 0
+
+    def _limited_answer(self, contents):
+        self.requests += 1
+        if self.rng.random() < self.rate_limit_probability:
+            raise RateLimitError("429 RESOURCE_EXHAUSTED")
+        return self._answer(contents)
+
+    def generate_content(self, model, contents, config=None):
+        time.sleep(self.latency)
+        return self._limited_answer(contents)
+
+
+class FakeAioModels:
+    def __init__(self, models):
+        self.models = models
+
+    async def generate_content(self, model, contents, config=None):
+        await asyncio.sleep(self.models.latency)
+        return self.models._limited_answer(contents)
+
+
+class FakeClient(OfflineClient):
+    def __init__(self, latency, rate_limit_probability):
+        super().__init__()
+        self.models = FakeModels(latency, rate_limit_probability)
+        self.aio.models = FakeAioModels(self.models)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure RAG answer throughput against a fake Gemini model.")
+    parser.add_argument("--queries", default="rawInput/queries.json")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--rate-limit-probability", type=float, default=0.05)
+    parser.add_argument("--concurrency", default="1,4,8,16")
+    args = parser.parse_args()
+
+    with open(args.queries, "r") as f:
+        items = json.load(f)
+    queries = [item["question"] for item in items] * args.repeat
+    contexts = [item.get("context", "") for item in items] * args.repeat
+
+    client = FakeClient(args.latency, 0.0)
+    rag = RAG(api_key=None, client=client, backoff=0.05)
+    start = time.perf_counter()
+    for query, context in zip(queries, contexts):
+        rag.generate_answer(query, context)
+    elapsed = time.perf_counter() - start
+    print(f"sequential generate_answer: {elapsed:6.2f}s {len(queries) / elapsed:7.1f} queries/sec")
+
+    for concurrency in [int(value) for value in args.concurrency.split(",")]:
+        client = FakeClient(args.latency, args.rate_limit_probability)
+        rag = RAG(api_key=None, client=client, backoff=0.05)
+        start = time.perf_counter()
+        answers = rag.generate_answers(queries, contexts, concurrency=concurrency)
+        elapsed = time.perf_counter() - start
+        failed = sum(answer is None for answer in answers)
+        print(f"generate_answers concurrency={concurrency:<3} {elapsed:6.2f}s {len(queries) / elapsed:7.1f} queries/sec "
+              f"({client.models.requests} requests, {failed} failed)")
+
+
+if __name__ == "__main__":
+    main()
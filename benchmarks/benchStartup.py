@@ -0,0 +1,64 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter so that module imports are not already cached.
+CHILD = r"""
+import json, os, sys, tempfile, time
+start = time.perf_counter()
+options = json.loads(sys.argv[1])
+sys.path.insert(0, options["repo"])
+from vectorStorage import VectorStore
+from RAG import RAG
+from references import ReferenceManager
+
+vector_storage = VectorStore(options["db"])
+vector_storage.embedder.warmup(background=not options["eager"])
+rag = RAG(model="gemini-1.5-flash", api_key=os.getenv("GEMINI_API_KEY"))
+ReferenceManager(os.path.join(tempfile.mkdtemp(), "references.json"))
+first_prompt = time.perf_counter() - start
+
+results = vector_storage.search(options["query"])
+retrieved = time.perf_counter() - start
+if options["live"]:
+    rag.query_gemini("\n".join(item["text"] for item in results), options["query"])
+first_answer = time.perf_counter() - start
+print(json.dumps({"first_prompt": first_prompt, "retrieved": retrieved, "first_answer": first_answer}))
+"""
+
+
+def run(options):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", CHILD, json.dumps(options)], cwd=REPO_DIR,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup run failed:\n{result.stderr}")
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["process"] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import-to-first-prompt and import-to-first-answer times.")
+    parser.add_argument("--db", default="./chroma")
+    parser.add_argument("--query", default="Why did the British focus their attention on Sri Lanka?")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--live", action="store_true", help="Also call Gemini for the first answer (needs GEMINI_API_KEY).")
+    args = parser.parse_args()
+
+    for eager in (True, False):
+        label = "eager model load" if eager else "lazy model load"
+        options = {"repo": REPO_DIR, "db": args.db, "query": args.query, "live": args.live, "eager": eager}
+        runs = [run(options) for _ in range(args.runs)]
+        best = {key: min(timings[key] for timings in runs) for key in runs[0]}
+        print(f"{label:<17} first prompt {best['first_prompt']:6.2f}s | retrieval done {best['retrieved']:6.2f}s | "
+              f"first answer {best['first_answer']:6.2f}s | process {best['process']:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; max RSS is left out of the report there.
+    resource = None
+
+# Everything needed is expected to be on disk already; never reach out to the hub.
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vectorStorage import VectorStore
+from instrumentation import metrics
+
+
+def is_relevant(item, references):
+    """A retrieved chunk is relevant if it matches a labeled chunk ID, page or section."""
+    chunk_ids = {str(chunk_id) for chunk_id in references.get("chunkIds", [])}
+    if chunk_ids:
+        return str(item.get("chunkId")) in chunk_ids
+    pages = {str(page) for page in references.get("pages", [])}
+    if item.get("page") is not None and str(item["page"]) in pages:
+        return True
+    section = (item.get("section") or "").lower()
+    return any(label.lower() in section for label in references.get("sections", []) if label)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def latency_summary(values):
+    return {
+        "mean_ms": sum(values) / len(values) if values else None,
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+    }
+
+
+def evaluate(store, items, ks, search_options, threshold=None, rag=None):
+    max_k = max(ks)
+    hits = {k: 0 for k in ks}
+    reciprocal_ranks = []
+    embed_latencies, search_latencies, generation_latencies = [], [], []
+    per_query = []
+
+    for item in items:
+        query = item["question"]
+        references = item.get("references", {})
+
+        start = time.perf_counter()
+        store.embedder.encode([query], use_cache=False)
+        embed_latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        results = store.search(query, top_k=max_k, **search_options)
+        search_latencies.append((time.perf_counter() - start) * 1000)
+
+        if threshold is not None:
+            results = [result for result in results if result["score"] <= threshold]
+        rank = next((i + 1 for i, result in enumerate(results) if is_relevant(result, references)), None)
+        for k in ks:
+            hits[k] += rank is not None and rank <= k
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+
+        if rag is not None:
+            start = time.perf_counter()
+            rag.generate_answer(query, "\n".join(result["text"] for result in results))
+            generation_latencies.append((time.perf_counter() - start) * 1000)
+
+        per_query.append({
+            "query_id": item.get("query_id"),
+            "first_relevant_rank": rank,
+            "retrieved": [str(result["chunkId"]) for result in results],
+        })
+
+    count = len(items)
+    report = {
+        "retrieval": {
+            **{f"recall@{k}": hits[k] / count if count else 0.0 for k in ks},
+            "mrr": sum(reciprocal_ranks) / count if count else 0.0,
+        },
+        "latency": {
+            "embed": latency_summary(embed_latencies),
+            "search": latency_summary(search_latencies),
+        },
+        "queries": per_query,
+    }
+    if rag is not None:
+        report["latency"]["generation"] = latency_summary(generation_latencies)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality and latency over labeled queries.")
+    parser.add_argument("--db", default="./chroma")
+    parser.add_argument("--queries", default="rawInput/queries.json")
+    parser.add_argument("--k", default="1,3,5,10", help="Comma separated cut-offs for recall@k.")
+    parser.add_argument("--mode", default="dense", choices=["dense", "hybrid"])
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="Drop results whose distance is above this, as main.py does.")
+    parser.add_argument("--fake-rag", action="store_true", help="Also time answer generation against a fake model.")
+    parser.add_argument("--output", default="evaluation_report.json")
+    args = parser.parse_args()
+
+    with open(args.queries, "r") as f:
+        items = json.load(f)
+    ks = sorted({int(k) for k in args.k.split(",")})
+
+    # Memory is measured in a first pass of its own (loading the store and the
+    # model included), since tracing slows down every allocation and would
+    # inflate the latencies of the timed pass.
+    tracemalloc.start()
+    store = VectorStore(args.db)
+    store.embedder.warmup(background=False)
+
+    rag = None
+    if args.fake_rag:
+        from RAG import RAG
+        from benchRagThroughput import FakeClient
+        rag = RAG(api_key=None, client=FakeClient(latency=0.0, rate_limit_probability=0.0))
+
+    evaluate(store, items, ks, {"mode": args.mode}, args.threshold, rag)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    metrics.reset()
+    report = evaluate(store, items, ks, {"mode": args.mode}, args.threshold, rag)
+
+    report["memory"] = {"python_peak_mb": traced_peak / (1024 * 1024)}
+    if resource is not None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere.
+        report["memory"]["max_rss_mb"] = max_rss / (1024 * 1024) if platform.system() == "Darwin" else max_rss / 1024
+    report["stages"] = metrics.to_dict()
+    report["config"] = {
+        "db": args.db,
+        "queries": args.queries,
+        "query_count": len(items),
+        "mode": args.mode,
+        "threshold": args.threshold,
+        "model": store.embedder.model_name,
+        "chunks": store.collection.count(),
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(json.dumps({key: report[key] for key in ("retrieval", "latency", "memory")}, indent=2, sort_keys=True))
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import os
+import logging
+import threading
+from embedder import Embedder
+
+logger = logging.getLogger(__name__)
+
+_clients = {}
+_collections = {}
+_clients_lock = threading.RLock()
+_function_type = None
+
+
+def get_client(persist_dir: str = "chroma"):
+    """Return the process-wide Chroma client for `persist_dir`, opening it on first use."""
+    path = os.path.realpath(persist_dir)
+    with _clients_lock:
+        if path not in _clients:
+            import chromadb
+
+            os.makedirs(path, exist_ok=True)
+            _clients[path] = chromadb.PersistentClient(path=path)
+        return _clients[path]
+
+
+def _embedder_function_type():
+    """
+    Build the EmbedderFunction class on first use, so importing this module
+    does not import chromadb.
+    """
+    global _function_type
+    with _clients_lock:
+        if _function_type is not None:
+            return _function_type
+        from chromadb.api.types import Documents, EmbeddingFunction
+        from chromadb.utils.embedding_functions import register_embedding_function
+
+        @register_embedding_function
+        class EmbedderFunction(EmbeddingFunction[Documents]):
+            """
+            Chroma embedding function backed by an Embedder, so documents and
+            query texts Chroma embeds itself get the same vectors as
+            VectorStore writes and searches with.
+            """
+
+            def __init__(self, embedder: Embedder):
+                self.embedder = embedder
+
+            def __call__(self, input: Documents):
+                return list(self.embedder.encode(list(input)))
+
+            def embed_query(self, input: Documents):
+                # Queries skip the embedding cache, as in VectorStore.search.
+                return list(self.embedder.encode(list(input), use_cache=False))
+
+            @staticmethod
+            def name() -> str:
+                return "rag_embedder"
+
+            def get_config(self):
+                return {"model_name": self.embedder.model_name}
+
+            @staticmethod
+            def build_from_config(config):
+                return EmbedderFunction(Embedder(model_name=config["model_name"]))
+
+        _function_type = EmbedderFunction
+        return _function_type
+
+
+def embedder_function(embedder: Embedder):
+    """Wrap `embedder` as a Chroma embedding function."""
+    return _embedder_function_type()(embedder)
+
+
+def _open_collection(persist_dir: str, name: str, embedder: Embedder):
+    client = get_client(persist_dir)
+    try:
+        return client.get_or_create_collection(name=name, embedding_function=embedder_function(embedder))
+    except ValueError as e:
+        if "conflict" not in str(e):
+            raise
+        # Collections created before the embedder was attached (e.g. with
+        # Chroma's default function) keep the function they were created
+        # with; Chroma does not allow replacing it.
+        collection = client.get_collection(name)
+        logger.warning("Collection %s keeps the embedding function it was created with; texts Chroma embeds "
+                       "itself will not use the %s embedder.", name, embedder.model_name)
+        return collection
+
+
+def get_collection(persist_dir: str, name: str, embedder: Embedder):
+    """
+    Return the process-wide handle of collection `name` in `persist_dir`,
+    creating it on first use with `embedder` as its embedding function.
+    Raises ValueError if the handle is already open with a different model.
+    """
+    key = (os.path.realpath(persist_dir), name)
+    with _clients_lock:
+        if key not in _collections:
+            _collections[key] = (_open_collection(persist_dir, name, embedder), embedder.model_name)
+        collection, model_name = _collections[key]
+        if embedder.model_name != model_name:
+            raise ValueError(f"Collection {name} in {persist_dir} is already open with the {model_name} "
+                             f"embedder, not {embedder.model_name}.")
+        return collection
+
+
+def reset_collection(persist_dir: str, name: str, embedder: Embedder):
+    """Delete collection `name` and create it again empty, replacing the shared handle."""
+    key = (os.path.realpath(persist_dir), name)
+    with _clients_lock:
+        get_client(persist_dir).delete_collection(name)
+        _collections.pop(key, None)
+        return get_collection(persist_dir, name, embedder)
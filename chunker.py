@@ -0,0 +1,105 @@
+def count_word_tokens(text):
+    from nltk.tokenize import word_tokenize
+
+    return len(word_tokenize(text))
+
+
+class StreamingChunker:
+    """
+    Packs a stream of sentences into chunks of at most `chunk_size` tokens.
+
+    Every sentence is tokenized exactly once and the chunk length is kept as a
+    running total, so chunking is linear in the length of the input. With
+    `overlap=0` the output matches the previous approach of re-tokenizing the
+    whole candidate chunk for every sentence, as long as the token count of
+    joined sentences is the sum of their counts.
+    """
+
+    def __init__(self, chunk_size, overlap=0, stride=None, token_counter=None, keep_oversized=True):
+        if stride is not None:
+            if stride <= 0 or stride > chunk_size:
+                raise ValueError("stride must be between 1 and chunk_size.")
+            overlap = chunk_size - stride
+        if overlap < 0 or overlap >= chunk_size:
+            raise ValueError("overlap must be between 0 and chunk_size - 1.")
+
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.count_tokens = token_counter or count_word_tokens
+        # When False, a sentence that does not fit into an empty chunk is dropped
+        # instead of becoming a chunk of its own (the PDF extraction behaviour).
+        self.keep_oversized = keep_oversized
+        self.reset()
+
+    def reset(self):
+        self._sentences = []
+        self._counts = []
+        self._tokens = 0
+
+    def __len__(self):
+        return self._tokens
+
+    def text(self):
+        return " ".join(self._sentences).strip()
+
+    def add(self, sentence, limit=None, token_count=None):
+        """
+        Add one sentence and return the chunk it completed, or None.
+
+        `limit` overrides `chunk_size` for this sentence (used when part of the
+        budget is reserved, e.g. for a section heading). `token_count` can be
+        passed when the sentence was already tokenized elsewhere.
+        """
+        if limit is None:
+            limit = self.chunk_size
+        if token_count is None:
+            token_count = self.count_tokens(sentence)
+
+        if self._tokens + token_count <= limit:
+            self._push(sentence, token_count)
+            return None
+
+        completed = self.text()
+        if not completed and not self.keep_oversized:
+            return None
+
+        carried = self._carry_over(token_count, limit) if completed else ([], [])
+        self.reset()
+        for carried_sentence, carried_count in zip(*carried):
+            self._push(carried_sentence, carried_count)
+        self._push(sentence.strip(), token_count)
+        return completed or None
+
+    def flush(self):
+        """Return the pending chunk, if any, and start a new one."""
+        completed = self.text()
+        self.reset()
+        return completed or None
+
+    def chunk(self, sentences, limit=None):
+        for sentence in sentences:
+            completed = self.add(sentence, limit)
+            if completed:
+                yield completed
+        completed = self.flush()
+        if completed:
+            yield completed
+
+    def _push(self, sentence, token_count):
+        self._sentences.append(sentence)
+        self._counts.append(token_count)
+        self._tokens += token_count
+
+    def _carry_over(self, incoming_count, limit):
+        if not self.overlap:
+            return [], []
+        budget = min(self.overlap, limit - incoming_count)
+        carried_sentences, carried_counts = [], []
+        total = 0
+        for sentence, count in zip(reversed(self._sentences), reversed(self._counts)):
+            if total + count > budget:
+                break
+            carried_sentences.insert(0, sentence)
+            carried_counts.insert(0, count)
+            total += count
+        return carried_sentences, carried_counts
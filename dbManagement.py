@@ -1,88 +1,109 @@
-import os
-from chromadb.config import Settings
-import chromadb
-
-class DBManager:
-    def __init__(self, db_directory='./chroma'):
-        if not os.path.exists(db_directory):
-            os.makedirs(db_directory)
-
-        print(f"Using database directory: {os.path.abspath(db_directory)}")
-        
-        print(f"Using persist directory: {db_directory}")
-        self.client = chromadb.PersistentClient(settings=Settings(persist_directory=db_directory))
-        self.collection = self.client.get_or_create_collection("documents")
-
-    def insert_data(self, document_data):
-        try:
-            chunks = document_data['chunks']
-            metadata = document_data['metadata']
-
-            if len(chunks) != len(metadata):
-                raise ValueError("Number of chunks does not match number of metadata entries.")
-
-            self.collection.add(
-                documents=chunks,
-                metadatas=metadata,
-                ids=[str(item['chunkId']) for item in metadata]
-            )
-            print("Data inserted successfully.")
-        except Exception as e:
-            print(f"Error inserting data: {e}")
-
-    def retrieve_data(self, query, n_results=5):
-        try:
-            results = self.collection.query(query_texts=[query], n_results=n_results)
-
-            print("Raw Retrieved Results:", results)
-            if 'documents' in results and isinstance(results['documents'], list):
-                formatted_results = []
-                for i in range(min(n_results, len(results['documents'][0]))):
-                    document_text = results['documents'][0][i]
-                    metadata = results['metadatas'][0][i] if 'metadatas' in results else {}
-
-                    formatted_results.append({
-                        "chunkId": metadata.get('chunkId', 'N/A'),
-                        "page": metadata.get('page', 'N/A'),
-                        "section": metadata.get('section', 'N/A'),
-                        "text": document_text
-                    })
-
-                return formatted_results
-            else:
-                print("Error: Unexpected results format or missing 'documents'.")
-                return []
-
-        except Exception as e:
-            print(f"Error retrieving data: {e}")
-            return []
-
-    def update_data(self, chunkId, new_text):
-        try:
-            results = self.collection.get(
-                ids=[str(chunkId)],
-                include=['metadatas']
-            )
-
-            if results and results['ids']:
-                if results['ids'][0] == str(chunkId):
-                    metadata_to_update = results.get('metadatas', [{}])[0] if results.get('metadatas') and results['metadatas'] else {}
-                    self.collection.update(
-                        ids=[str(chunkId)],
-                        documents=[new_text],
-                        metadatas=[metadata_to_update]
-                    )
-                    print(f"Chunk {chunkId} updated successfully.")
-                else:
-                    print(f"No document found with chunkId {chunkId}.")
-            else:
-                print(f"No document found with chunkId {chunkId}.")
-        except Exception as e:
-            print(f"Error updating data: {e}")
-
-    def delete_data(self, chunkId):
-        try:
-            self.collection.delete(ids=[str(chunkId)])
-            print(f"Chunk {chunkId} deleted successfully.")
-        except Exception as e:
-            print(f"Error deleting data: {e}")
+import os
+import logging
+from typing import Dict, List
+from embedder import Embedder
+from chromaClient import get_client, get_collection
+from instrumentation import span
+
+logger = logging.getLogger(__name__)
+
+class DBManager:
+    def __init__(self, db_directory='./chroma', collection_name="documents", embedder=None):
+        """
+        Texts are embedded with `embedder` (by default the same model and
+        cache VectorStore uses for `db_directory`). The Chroma client and
+        collection handles are shared with every other user of the directory
+        in this process.
+        """
+        logger.info("Using database directory: %s", os.path.abspath(db_directory))
+        self.embedder = embedder or Embedder(cache_path=os.path.join(db_directory, "embedding_cache.sqlite"))
+        self.db_directory = db_directory
+        self.collection_name = collection_name
+        self.client = get_client(db_directory)
+
+    @property
+    def collection(self):
+        return get_collection(self.db_directory, self.collection_name, self.embedder)
+
+    def insert_data(self, document_data, batch_size=256):
+        """
+        Add chunks in batches of `batch_size`. Errors are raised rather than
+        printed, so a failed batch stops the run instead of being skipped.
+        """
+        chunks = document_data['chunks']
+        metadata = document_data['metadata']
+
+        if len(chunks) != len(metadata):
+            raise ValueError("Number of chunks does not match number of metadata entries.")
+
+        for start in range(0, len(chunks), batch_size):
+            end = start + batch_size
+            self.collection.add(
+                documents=chunks[start:end],
+                metadatas=metadata[start:end],
+                ids=[str(item['chunkId']) for item in metadata[start:end]]
+            )
+            logger.debug("Inserted %d/%d chunks.", min(end, len(chunks)), len(chunks))
+        logger.info("Data inserted successfully.")
+
+    def retrieve_data(self, query, n_results=5):
+        try:
+            with span("search"):
+                results = self.collection.query(query_texts=[query], n_results=n_results)
+
+            logger.debug("Raw retrieved results: %s", results)
+            if 'documents' in results and isinstance(results['documents'], list):
+                formatted_results = []
+                for i in range(min(n_results, len(results['documents'][0]))):
+                    document_text = results['documents'][0][i]
+                    metadata = results['metadatas'][0][i] if 'metadatas' in results else {}
+
+                    formatted_results.append({
+                        "chunkId": metadata.get('chunkId', 'N/A'),
+                        "page": metadata.get('page', 'N/A'),
+                        "section": metadata.get('section', 'N/A'),
+                        "text": document_text
+                    })
+
+                return formatted_results
+            else:
+                logger.error("Unexpected results format or missing 'documents'.")
+                return []
+
+        except Exception as e:
+            logger.error("Error retrieving data: %s", e)
+            return []
+
+    def update_many(self, updates: Dict[str, str]) -> List[str]:
+        """
+        Replace the text of several chunks, given as {chunkId: new_text}, in
+        one store call; their metadata is kept. Returns the updated IDs.
+        """
+        ids = [str(chunk_id) for chunk_id in updates]
+        try:
+            existing = set(self.collection.get(ids=ids, include=[])['ids'])
+            missing = [chunk_id for chunk_id in ids if chunk_id not in existing]
+            if missing:
+                logger.warning("No documents found with chunkIds %s.", missing)
+            found = [chunk_id for chunk_id in ids if chunk_id in existing]
+            if found:
+                texts = {str(chunk_id): text for chunk_id, text in updates.items()}
+                self.collection.update(ids=found, documents=[texts[chunk_id] for chunk_id in found])
+                logger.info("Updated %d chunks.", len(found))
+            return found
+        except Exception as e:
+            logger.error("Error updating data: %s", e)
+            return []
+
+    def update_data(self, chunkId, new_text):
+        return bool(self.update_many({chunkId: new_text}))
+
+    def delete_many(self, chunk_ids: List[str]):
+        try:
+            self.collection.delete(ids=[str(chunk_id) for chunk_id in chunk_ids])
+            logger.info("Deleted %d chunks.", len(chunk_ids))
+        except Exception as e:
+            logger.error("Error deleting data: %s", e)
+
+    def delete_data(self, chunkId):
+        self.delete_many([chunkId])
@@ -0,0 +1,147 @@
+import os
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+from typing import List
+from instrumentation import span, increment
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def load_model(model_name: str):
+    """Return the process-wide instance of `model_name`, loading it on first use."""
+    with _models_lock:
+        if model_name not in _models:
+            from sentence_transformers import SentenceTransformer
+            _models[model_name] = SentenceTransformer(model_name)
+        return _models[model_name]
+
+
+class EmbeddingCache:
+    """Persistent map of (model name, text hash) -> float32 embedding, stored in SQLite."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, hashes: List[str]) -> dict:
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's limit on bound parameters.
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                    [model, *batch],
+                )
+                for text_hash, vector in rows:
+                    found[text_hash] = np.frombuffer(vector, dtype=np.float32)
+        return found
+
+    def put_many(self, model: str, items):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                [(model, text_hash, np.asarray(vector, dtype=np.float32).tobytes()) for text_hash, vector in items],
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class Embedder:
+    """
+    Batched sentence embedding with an optional persistent cache.
+
+    Texts already in the cache are never sent to the model again. The rest are
+    sorted by length before batching so each batch pads to similar lengths.
+    The model is loaded on first use, or ahead of time with `warmup`.
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", batch_size: int = 64, normalize: bool = False,
+                 dtype: str = "float32", cache_path: str = None):
+        if dtype not in ("float32", "float16"):
+            raise ValueError("dtype must be 'float32' or 'float16'.")
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.normalize = normalize
+        self.dtype = np.dtype(dtype)
+        self.cache = EmbeddingCache(cache_path) if cache_path else None
+
+    @property
+    def model(self):
+        return load_model(self.model_name)
+
+    def warmup(self, background: bool = True):
+        """Load the model now, in a daemon thread unless `background` is False."""
+        if not background:
+            load_model(self.model_name)
+            return None
+        thread = threading.Thread(target=load_model, args=(self.model_name,), daemon=True)
+        thread.start()
+        return thread
+
+    def encode(self, texts: List[str], use_cache: bool = True) -> np.ndarray:
+        with span("embed"):
+            return self._encode(texts, use_cache)
+
+    def _encode(self, texts: List[str], use_cache: bool) -> np.ndarray:
+        texts = list(texts)
+        vectors = [None] * len(texts)
+        hashes = [EmbeddingCache.text_hash(text) for text in texts] if self.cache and use_cache else None
+
+        if hashes:
+            cached = self.cache.get_many(self.model_name, list(set(hashes)))
+            for i, text_hash in enumerate(hashes):
+                vectors[i] = cached.get(text_hash)
+
+        pending = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                pending.setdefault(texts[i], []).append(i)
+        missing = sorted(pending, key=len)
+        increment("embed_texts", len(texts))
+        increment("embed_computed", len(missing))
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            embeddings = self.model.encode(
+                batch,
+                batch_size=len(batch),
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            ).astype(np.float32)
+            for text, embedding in zip(batch, embeddings):
+                for i in pending[text]:
+                    vectors[i] = embedding
+            if hashes:
+                self.cache.put_many(self.model_name, [(EmbeddingCache.text_hash(text), embedding)
+                                                      for text, embedding in zip(batch, embeddings)])
+
+        if not texts:
+            return np.zeros((0, self.dimension()), dtype=self.dtype)
+        result = np.vstack(vectors)
+        if self.normalize:
+            norms = np.linalg.norm(result, axis=1, keepdims=True)
+            result = result / np.maximum(norms, 1e-12)
+        return result.astype(self.dtype, copy=False)
+
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
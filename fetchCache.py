@@ -0,0 +1,249 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import requests
+from collections import OrderedDict
+from instrumentation import increment
+
+logger = logging.getLogger(__name__)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FetchCache:
+    """
+    On-disk cache of fetched pages and extracted text used during ingestion.
+
+    URL entries are keyed by a hash of the URL and keep the raw body, the clean
+    text extracted from it and the ETag/Last-Modified validators, so a cached
+    page is revalidated with a conditional GET instead of being downloaded
+    again, and served as is when revalidation fails. PDF entries are keyed by
+    the SHA-256 of the file. The cache is bounded by `max_bytes` and evicts
+    the least recently used entries. In offline mode the network is never
+    used and only cached entries are served.
+
+    Every changed or evicted entry is appended as one JSON line to
+    `index.log`; the log is folded into the `index.json` snapshot by `save()`
+    or `close()`, or once it holds more records than there are entries, so
+    recording a fetch costs constant time however large the cache is.
+    """
+
+    def __init__(self, cache_dir="preprocessed_data/fetch_cache", max_bytes=512 * 1024 * 1024,
+                 offline=False, max_age=0):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.max_age = max_age
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.log_path = os.path.join(cache_dir, "index.log")
+        self._lock = threading.Lock()
+        self._log_records = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        # Ordered from least to most recently used, so eviction never sorts.
+        self.entries = OrderedDict(sorted(self._load_index().items(), key=lambda item: item[1].get("last_access", 0)))
+        self.total_bytes = sum(entry.get("size", 0) for entry in self.entries.values())
+        self._log = open(self.log_path, "a", encoding="utf-8")
+
+    def _load_index(self):
+        entries = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as f:
+                entries = json.load(f)
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-write.
+                        continue
+                    if record["entry"] is None:
+                        entries.pop(record["key"], None)
+                    else:
+                        entries[record["key"]] = record["entry"]
+                    self._log_records += 1
+        return entries
+
+    def save(self):
+        with self._lock:
+            self._write_index()
+
+    def close(self):
+        with self._lock:
+            if self._log is not None:
+                self._write_index()
+                self._log.close()
+                self._log = None
+
+    def _write_index(self):
+        """Write every entry to the snapshot and start an empty log."""
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.index_path)
+        if self._log is not None:
+            # Replaying records already in the snapshot only sets the same
+            # entries again, so a crash before this truncation loses nothing.
+            self._log.truncate(0)
+            self._log.seek(0)
+        self._log_records = 0
+
+    def _record(self, key):
+        """Append the current state of `key` (None once evicted) to the log."""
+        if self._log is None:
+            return
+        self._log.write(json.dumps({"key": key, "entry": self.entries.get(key)}) + "\n")
+        self._log.flush()
+        self._log_records += 1
+        if self._log_records > max(len(self.entries), 1000):
+            self._write_index()
+
+    def _set_entry(self, key, entry):
+        """Add or replace `key` as the most recently used entry."""
+        previous = self.entries.pop(key, {})
+        self.total_bytes += entry.get("size", 0) - previous.get("size", 0)
+        self.entries[key] = entry
+
+    @staticmethod
+    def url_key(url):
+        return "url-" + hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def pdf_key(path):
+        return "pdf-" + file_sha256(path)
+
+    def _path(self, key, suffix):
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def _read(self, key, suffix):
+        try:
+            with open(self._path(key, suffix), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, key, suffix, data):
+        path = self._path(key, suffix)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _size(self, key):
+        return sum(os.path.getsize(self._path(key, suffix))
+                   for suffix in (".body", ".txt") if os.path.exists(self._path(key, suffix)))
+
+    def _touch(self, key):
+        self.entries[key]["last_access"] = time.time()
+        self.entries.move_to_end(key)
+
+    def fetch(self, url, fetcher):
+        """
+        Return (body, changed) for `url`, downloading or revalidating with
+        `fetcher` as needed. `changed` is False when the cached body was reused,
+        including when revalidation fails and the cached copy is served stale.
+        Returns (None, False) when the page is unavailable and not cached, or
+        when the server reports it gone (404 or 410).
+        """
+        key = self.url_key(url)
+        with self._lock:
+            entry = dict(self.entries.get(key, {}))
+        body = self._read(key, ".body") if entry else None
+
+        if body is not None:
+            fresh = self.max_age and time.time() - entry.get("fetched_at", 0) < self.max_age
+            if self.offline or fresh:
+                with self._lock:
+                    self._touch(key)
+                increment("fetch_cache_hits")
+                return body, False
+        elif self.offline:
+            logger.warning("Offline: no cached copy of %s", url)
+            return None, False
+
+        headers = {}
+        if body is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            response = fetcher.get(url, headers=headers)
+        except requests.exceptions.RequestException as e:
+            increment("fetch_errors")
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            if body is not None and status not in (404, 410):
+                # A failed revalidation is no reason to drop the page; serve the copy we have.
+                logger.warning("Error fetching URL %s: %s; using the cached copy", url, e)
+                with self._lock:
+                    if key in self.entries:
+                        self._touch(key)
+                increment("fetch_stale")
+                return body, False
+            logger.warning("Error fetching URL %s: %s", url, e)
+            return None, False
+
+        with self._lock:
+            if response.status_code == 304 and body is not None and key in self.entries:
+                self.entries[key]["fetched_at"] = time.time()
+                self._touch(key)
+                self._record(key)
+                increment("fetch_not_modified")
+                return body, False
+
+            body = response.content
+            self._write(key, ".body", body)
+            text_path = self._path(key, ".txt")
+            if os.path.exists(text_path):
+                os.remove(text_path)
+            self._set_entry(key, {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched_at": time.time(),
+                "last_access": time.time(),
+                "size": len(body),
+            })
+            self._record(key)
+            self._evict()
+        return body, True
+
+    def get_text(self, key):
+        """Return the clean text cached for `key`, or None."""
+        with self._lock:
+            if key not in self.entries:
+                return None
+            self._touch(key)
+        text = self._read(key, ".txt")
+        return text.decode("utf-8") if text is not None else None
+
+    def put_text(self, key, text):
+        with self._lock:
+            self._write(key, ".txt", text.encode("utf-8"))
+            entry = dict(self.entries.get(key, {}))
+            entry.update(last_access=time.time(), size=self._size(key))
+            self._set_entry(key, entry)
+            self._record(key)
+            self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self.entries:
+            key, entry = self.entries.popitem(last=False)
+            self.total_bytes -= entry.get("size", 0)
+            self._record(key)
+            for suffix in (".body", ".txt"):
+                path = self._path(key, suffix)
+                if os.path.exists(path):
+                    os.remove(path)
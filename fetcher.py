@@ -0,0 +1,148 @@
+import os
+import time
+import logging
+import threading
+from urllib.parse import urlsplit
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from instrumentation import span, increment, observe
+
+logger = logging.getLogger(__name__)
+
+
+def _timed_parse(parse, body, url):
+    """Run `parse` in a pool worker and report how long it took, since workers cannot record metrics."""
+    start = time.perf_counter()
+    return parse(body, url), (time.perf_counter() - start) * 1000
+
+
+class Fetcher:
+    """
+    Concurrent HTTP fetcher backed by one pooled, keep-alive session.
+
+    Downloads run on a thread pool with a per-host concurrency limit, transient
+    failures are retried with exponential backoff, and the optional parse step
+    runs on a process pool so HTML parsing overlaps with network I/O.
+    """
+
+    def __init__(self, max_workers=8, per_host=2, parse_workers=None, retries=3,
+                 backoff_factor=0.5, timeout=10, session=None):
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.parse_workers = os.cpu_count() if parse_workers is None else parse_workers
+        self.timeout = timeout
+        self.session = session or self._build_session(retries, backoff_factor)
+        self._host_limits = {}
+        self._host_limits_lock = threading.Lock()
+
+    def _build_session(self, retries, backoff_factor):
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET", "HEAD"),
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _host_limit(self, url):
+        host = urlsplit(url).netloc
+        with self._host_limits_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_limits[host]
+
+    def get(self, url, headers=None):
+        """Send a GET request, honouring the per-host limit. Raises on HTTP errors."""
+        with self._host_limit(url), span("fetch"):
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        increment("fetch_bytes", len(response.content))
+        response.raise_for_status()
+        return response
+
+    def fetch(self, url):
+        """Return the response body of `url`, or None if it could not be fetched."""
+        try:
+            return self.get(url).content
+        except requests.exceptions.RequestException as e:
+            increment("fetch_errors")
+            logger.warning("Error fetching URL %s: %s", url, e)
+            return None
+
+    def iter_fetch(self, urls, parse=None, fetch=None):
+        """
+        Fetch `urls` concurrently and yield (url, result) pairs in input order.
+
+        `parse(body, url)` is applied to every downloaded body in the parse pool
+        and must be picklable (a module-level function) when parse_workers > 0.
+        `fetch` replaces the default download step; when it returns a str (text
+        that was already extracted, e.g. from a cache) the parse step is skipped.
+        Failed downloads or parses yield None.
+        """
+        urls = list(urls)
+        fetch = fetch or self.fetch
+        parse_pool = ProcessPoolExecutor(self.parse_workers) if parse and self.parse_workers > 0 else None
+        fetch_pool = ThreadPoolExecutor(self.max_workers)
+        results = [Future() for _ in urls]
+
+        def on_fetched(url, result, fetch_future):
+            try:
+                body = fetch_future.result()
+            except Exception as e:
+                increment("fetch_errors")
+                logger.warning("Error fetching URL %s: %s", url, e)
+                body = None
+            try:
+                if body is None or parse is None or isinstance(body, str):
+                    result.set_result(body)
+                elif parse_pool is None:
+                    result.set_result(self._parse(parse, url, body))
+                else:
+                    parse_future = parse_pool.submit(_timed_parse, parse, body, url)
+                    parse_future.add_done_callback(lambda f: result.set_result(self._parsed(url, f)))
+            except Exception as e:
+                # An exception here would only reach the executor's callback
+                # logger and leave the consumer waiting on `result` forever,
+                # e.g. when the parse pool broke after a worker crashed.
+                increment("parse_errors")
+                logger.warning("Error processing content from %s: %s", url, e)
+                if not result.done():
+                    result.set_result(None)
+
+        try:
+            for url, result in zip(urls, results):
+                fetch_future = fetch_pool.submit(fetch, url)
+                fetch_future.add_done_callback(lambda f, url=url, result=result: on_fetched(url, result, f))
+            for url, result in zip(urls, results):
+                yield url, result.result()
+        finally:
+            fetch_pool.shutdown(wait=True, cancel_futures=True)
+            if parse_pool is not None:
+                parse_pool.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _parse(parse, url, body):
+        try:
+            with span("parse"):
+                return parse(body, url)
+        except Exception as e:
+            increment("parse_errors")
+            logger.warning("Error processing content from %s: %s", url, e)
+            return None
+
+    @staticmethod
+    def _parsed(url, parse_future):
+        try:
+            result, milliseconds = parse_future.result()
+        except Exception as e:
+            increment("parse_errors")
+            logger.warning("Error processing content from %s: %s", url, e)
+            return None
+        observe("parse", milliseconds)
+        return result
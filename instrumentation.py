@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+# Upper bounds, in milliseconds, of the latency histogram buckets.
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, float("inf"))
+
+
+def project_loggers():
+    """Names of this project's module loggers, including the running script's."""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    return ["__main__"] + sorted(name[:-3] for name in os.listdir(directory) if name.endswith(".py"))
+
+
+def configure_logging(level=None):
+    """
+    Log to stderr with the root logger at WARNING, so third-party libraries
+    (httpx, sentence-transformers, chromadb) stay quiet, and set this
+    project's loggers to `level` or the RAG_LOG_LEVEL env var (default INFO).
+    """
+    level = level or os.getenv("RAG_LOG_LEVEL", "INFO")
+    level = level.upper() if isinstance(level, str) else level
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    for name in project_loggers():
+        logging.getLogger(name).setLevel(level)
+
+
+class Metrics:
+    """
+    Thread-safe counters and latency histograms for the pipeline stages.
+
+    Histograms keep a count, a sum and cumulative bucket counts, so recording
+    is constant time and the output maps directly onto Prometheus histograms.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, milliseconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = {"count": 0, "sum_ms": 0.0, "buckets": [0] * len(BUCKETS_MS)}
+            histogram["count"] += 1
+            histogram["sum_ms"] += milliseconds
+            for i, bound in enumerate(BUCKETS_MS):
+                if milliseconds <= bound:
+                    histogram["buckets"][i] += 1
+                    break
+
+    @contextmanager
+    def span(self, name):
+        """Time the enclosed block into the `name` histogram, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000)
+
+    def timed_iter(self, name, iterable):
+        """
+        Yield from `iterable` and record the time spent producing its items as
+        one `name` observation, leaving out the time the consumer spends
+        between items.
+        """
+        elapsed = 0.0
+        iterator = iter(iterable)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    elapsed += time.perf_counter() - start
+                    return
+                elapsed += time.perf_counter() - start
+                yield item
+        finally:
+            self.observe(name, elapsed * 1000)
+
+    def total_ms(self, name):
+        """Milliseconds recorded so far by the `name` histogram."""
+        with self._lock:
+            histogram = self.histograms.get(name)
+            return histogram["sum_ms"] if histogram else 0.0
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+
+    def to_dict(self):
+        with self._lock:
+            histograms = {}
+            for name, histogram in self.histograms.items():
+                histograms[name] = {
+                    "count": histogram["count"],
+                    "sum_ms": histogram["sum_ms"],
+                    "mean_ms": histogram["sum_ms"] / histogram["count"],
+                    "buckets": {str(bound): count for bound, count in zip(BUCKETS_MS, histogram["buckets"])},
+                }
+            return {"counters": dict(self.counters), "histograms": histograms}
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2, sort_keys=True)
+
+    def to_prometheus(self, prefix="rag"):
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                metric = f"{prefix}_{name}_total"
+                lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+            for name, histogram in sorted(self.histograms.items()):
+                metric = f"{prefix}_{name}_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(BUCKETS_MS, histogram["buckets"]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound / 1000)
+                    lines.append(f'{metric}_bucket{{le="{le}"}} {cumulative}')
+                lines += [f"{metric}_sum {histogram['sum_ms'] / 1000}", f"{metric}_count {histogram['count']}"]
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Write the metrics to `path`, as Prometheus text for a .prom file and JSON otherwise."""
+        with open(path, "w") as f:
+            f.write(self.to_prometheus() if path.endswith(".prom") else self.to_json())
+
+
+metrics = Metrics()
+span = metrics.span
+timed_iter = metrics.timed_iter
+increment = metrics.increment
+observe = metrics.observe
+
+
+@contextmanager
+def profiling(name="run"):
+    """
+    Profile the enclosed block when RAG_PROFILE is set: "cpu" runs cProfile,
+    "memory" runs tracemalloc, "cpu,memory" both. Results are written to
+    RAG_PROFILE_DIR (default "profiles"). When RAG_METRICS_FILE is set, the
+    collected metrics are written there at the end as well.
+    """
+    modes = {mode.strip() for mode in os.getenv("RAG_PROFILE", "").split(",") if mode.strip()}
+    output_dir = os.getenv("RAG_PROFILE_DIR", "profiles")
+    logger = logging.getLogger(__name__)
+    profiler = None
+    if modes:
+        os.makedirs(output_dir, exist_ok=True)
+    if "cpu" in modes:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    if "memory" in modes:
+        import tracemalloc
+
+        tracemalloc.start()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            path = os.path.join(output_dir, f"{name}.pstats")
+            profiler.dump_stats(path)
+            logger.info("CPU profile written to %s", path)
+        if "memory" in modes:
+            import tracemalloc
+
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            path = os.path.join(output_dir, f"{name}_memory.txt")
+            with open(path, "w") as f:
+                f.write(f"Peak traced memory: {peak / (1024 * 1024):.1f} MB\n")
+                for stat in snapshot.statistics("lineno")[:50]:
+                    f.write(f"{stat}\n")
+            logger.info("Memory profile written to %s", path)
+        metrics_file = os.getenv("RAG_METRICS_FILE")
+        if metrics_file:
+            metrics.dump(metrics_file)
+            logger.info("Metrics written to %s", metrics_file)
@@ -0,0 +1,101 @@
+import os
+import re
+import json
+import math
+import heapq
+from collections import Counter
+from typing import List, Set, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be by did do does for from had has have he her his how in is it its of on or "
+    "she that the their them they this to was were what when where which who why will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class LexicalIndex:
+    """
+    In-process BM25 inverted index over the stored chunks.
+
+    Only the per-chunk term frequencies are persisted; the postings lists are
+    rebuilt when the index is loaded.
+    """
+
+    def __init__(self, path: str = None, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.doc_terms = {}
+        self.doc_lengths = {}
+        self.postings = {}
+        self.total_length = 0
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                data = json.load(f)
+            for chunk_id, terms in data["docs"].items():
+                self._add(chunk_id, terms)
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def _add(self, chunk_id: str, terms: dict):
+        self.doc_terms[chunk_id] = terms
+        length = sum(terms.values())
+        self.doc_lengths[chunk_id] = length
+        self.total_length += length
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[chunk_id] = frequency
+
+    def add(self, chunk_ids: List[str], texts: List[str]):
+        """Index the given chunks, replacing any earlier version with the same ID."""
+        self.remove(chunk_ids)
+        for chunk_id, text in zip(chunk_ids, texts):
+            self._add(str(chunk_id), dict(Counter(tokenize(text))))
+
+    def remove(self, chunk_ids: List[str]):
+        for chunk_id in map(str, chunk_ids):
+            terms = self.doc_terms.pop(chunk_id, None)
+            if terms is None:
+                continue
+            self.total_length -= self.doc_lengths.pop(chunk_id)
+            for term in terms:
+                postings = self.postings[term]
+                del postings[chunk_id]
+                if not postings:
+                    del self.postings[term]
+
+    def clear(self):
+        self.doc_terms = {}
+        self.doc_lengths = {}
+        self.postings = {}
+        self.total_length = 0
+
+    def search(self, query: str, top_k: int = 5, allowed: Set[str] = None) -> List[Tuple[str, float]]:
+        """Return up to `top_k` (chunk_id, BM25 score) pairs, best first, optionally only from `allowed` IDs."""
+        if not self.doc_terms:
+            return []
+        doc_count = len(self.doc_terms)
+        average_length = self.total_length / doc_count
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, frequency in postings.items():
+                if allowed is not None and chunk_id not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[chunk_id] / average_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def save(self, path: str = None):
+        path = path or self.path
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"docs": self.doc_terms}, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
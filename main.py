@@ -1,69 +1,136 @@
-import os
-import dotenv
-from vectorStorage import VectorStore
-from RAG import RAG
-from references import ReferenceManager
-
-def main():
-    dotenv.load_dotenv()
-    db_directory = './chroma'
-    similarity_threshold = 0.9
-    print("Initializing vector storage...")
-    vector_storage = VectorStore(db_directory)
-
-    print("Setting up RAG pipeline with Gemini...")
-    rag = RAG(model="gemini-1.5-flash", api_key=os.getenv("GEMINI_API_KEY"))
-
-    reference_manager = ReferenceManager("references.json")
-
-    while True:
-        query = input("Enter your query (or 'exit' to quit): ")
-        if query.lower() == 'exit':
-            break
-        print(f"Query: {query}")
-
-        context_results = vector_storage.search(query)
-
-        similar_context = [
-            item for item in context_results if item["score"] <= similarity_threshold
-        ]
-        context_texts = [item["text"] for item in similar_context]
-        formatted_context = "\n".join(context_texts)
-        print(f"Context retrieved (filtered): {formatted_context}")
-        references_to_save = None
-        if not similar_context:
-            response_text = rag.query_gemini("", query)
-            print(f"Response: {response_text}")
-        else:
-
-            response_text = rag.query_gemini(formatted_context, query)
-            print(f"Response: {response_text}")
-
-            sections = set()
-            pages = set()
-            for item in similar_context:
-                if "section" in item:
-                    sections.add(item["section"])
-                if "page" in item:
-                    pages.add(str(item["page"]))
-
-            references_to_save = {
-                "sections": sorted(list(sections)),
-                "pages": sorted(list(pages))
-            }
-        if references_to_save != None and (references_to_save["sections"] or references_to_save["pages"]):
-            reference_manager.save_references(references_to_save)
-            if references_to_save != None:
-                print('sections')
-                for i in references_to_save.get('sections'):
-                    print(i)
-                print('pages')
-                for i in references_to_save.get('pages'):
-                    print(i)
-            else:
-                print('references: None')
-        else:
-            print("No relevant sections or pages found in the context.")
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+import os
+import time
+import logging
+import argparse
+import dotenv
+from vectorStorage import VectorStore
+from RAG import RAG
+from answerCache import AnswerCache
+from promptBuilder import PromptBuilder
+from references import ReferenceManager
+from batchQuery import OfflineClient, load_queries, run_batch, select_context, collect_references
+from instrumentation import configure_logging, profiling, metrics
+
+logger = logging.getLogger(__name__)
+
+def generate_response(rag, context, query, chunk_ids, stream):
+    if not stream:
+        response_text = rag.query_gemini(context, query, chunk_ids=chunk_ids)
+        print(f"Response: {response_text}")
+        return response_text
+
+    print("Response: ", end="", flush=True)
+    start = time.perf_counter()
+    first_token = None
+    pieces = []
+    for piece in rag.stream_answer(context, query, chunk_ids=chunk_ids):
+        if first_token is None:
+            first_token = time.perf_counter() - start
+        pieces.append(piece)
+        print(piece, end="", flush=True)
+    total = time.perf_counter() - start
+    print()
+    if first_token is not None:
+        logger.info("Time to first token: %.2fs, total: %.2fs", first_token, total)
+    return "".join(pieces).strip() or None
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Answer questions about the indexed documents.")
+    parser.add_argument("--batch", metavar="QUERIES_FILE",
+                        help="answer every question in a JSON queries file instead of prompting")
+    parser.add_argument("--output", default="answers.jsonl", help="JSONL file for the batch answers")
+    parser.add_argument("--concurrency", type=int, default=8, help="generation requests in flight in batch mode")
+    parser.add_argument("--offline", action="store_true",
+                        help="answer from the retrieved context without calling the model")
+    return parser.parse_args()
+
+def main(args):
+    dotenv.load_dotenv()
+    db_directory = './chroma'
+    similarity_threshold = 0.9
+    # Hybrid retrieval keeps chunks with a strong BM25 match on rare terms
+    # (names, dates) even when their dense distance misses the threshold.
+    retrieval_mode = "hybrid"
+    lexical_threshold = 5.0
+    # Narrow retrieval to part of the corpus, e.g. source_type="pdf",
+    # section_prefix="2." or pages=(40, 60); None searches everything.
+    search_filters = {"source_type": None, "section_prefix": None, "pages": None}
+    # Estimated tokens of retrieved context sent with each question.
+    context_token_budget = 1500
+    stream = True
+    logger.info("Initializing vector storage...")
+    vector_storage = VectorStore(db_directory)
+    # Load the embedding model while the user types the first question.
+    vector_storage.embedder.warmup()
+
+    prompt_builder = PromptBuilder(token_budget=context_token_budget)
+    if args.offline:
+        # Offline answers must not end up in the answer cache.
+        rag = RAG(api_key=None, client=OfflineClient())
+    else:
+        logger.info("Setting up RAG pipeline with Gemini...")
+        answer_cache = AnswerCache("answer_cache.json", semantic_threshold=0.05, embedder=vector_storage.embedder)
+        rag = RAG(model="gemini-1.5-flash", api_key=os.getenv("GEMINI_API_KEY"), cache=answer_cache)
+
+    if args.batch:
+        queries = load_queries(args.batch)
+        run_batch(queries, vector_storage, rag, prompt_builder, args.output,
+                  similarity_threshold=similarity_threshold, lexical_threshold=lexical_threshold,
+                  concurrency=args.concurrency, search_options={"mode": retrieval_mode, **search_filters})
+        logger.info("Answers written to %s", args.output)
+        if rag.cache is not None:
+            rag.cache.close()
+        return
+
+    reference_manager = ReferenceManager("references.json")
+
+    while True:
+        query = input("Enter your query (or 'exit' to quit): ")
+        if query.lower() == 'exit':
+            if rag.cache is not None:
+                logger.info("Answer cache: %s", rag.cache.stats())
+                rag.cache.close()
+            logger.info("Most cited pages: %s", reference_manager.most_cited_pages(5))
+            logger.debug("Metrics: %s", metrics.to_json())
+            reference_manager.close()
+            break
+        logger.info("Query: %s", query)
+
+        context_results = vector_storage.search(query, mode=retrieval_mode, **search_filters)
+
+        similar_context = select_context(context_results, similarity_threshold, lexical_threshold)
+        packed = prompt_builder.pack(similar_context)
+        similar_context = packed["items"]
+        formatted_context = packed["context"]
+        logger.debug("Context retrieved (filtered): %s", formatted_context)
+        logger.info("Context tokens: %d (saved %d of %d; %d duplicate and %d over-budget chunks dropped)",
+                    packed["tokens"], packed["tokens_saved"], packed["original_tokens"], packed["duplicates"],
+                    packed["over_budget"])
+        references_to_save = None
+        if not similar_context:
+            response_text = generate_response(rag, "", query, [], stream)
+        else:
+
+            chunk_ids = packed["chunk_ids"]
+            response_text = generate_response(rag, formatted_context, query, chunk_ids, stream)
+
+            references_to_save = collect_references(similar_context)
+        if references_to_save != None and (references_to_save["sections"] or references_to_save["pages"]):
+            reference_manager.save_references(references_to_save, chunk_ids=chunk_ids)
+            if references_to_save != None:
+                print('sections')
+                for i in references_to_save.get('sections'):
+                    print(i)
+                print('pages')
+                for i in references_to_save.get('pages'):
+                    print(i)
+            else:
+                print('references: None')
+        else:
+            print("No relevant sections or pages found in the context.")
+
+if __name__ == "__main__":
+    configure_logging()
+    args = parse_args()
+    with profiling("batch" if args.batch else "main"):
+        main(args)
\ No newline at end of file
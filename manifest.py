@@ -0,0 +1,55 @@
+import os
+import json
+import hashlib
+
+
+def content_chunk_id(source, text, occurrence=0):
+    """Stable ID of a chunk, derived from its source and text rather than its position."""
+    digest = hashlib.sha256(f"{source}\n{text}".encode("utf-8")).hexdigest()[:16]
+    return digest if occurrence == 0 else f"{digest}-{occurrence}"
+
+
+def iter_chunk_ids(items):
+    """Yield (text, metadata) pairs with content-hash chunk IDs, one chunk at a time."""
+    seen = {}
+    for text, meta in items:
+        chunk_id = content_chunk_id(meta.get("source"), text)
+        occurrence = seen.get(chunk_id, 0)
+        seen[chunk_id] = occurrence + 1
+        yield text, {**meta, "chunkId": chunk_id if occurrence == 0 else f"{chunk_id}-{occurrence}"}
+
+
+class ChunkManifest:
+    """
+    Record of the chunk IDs stored for every source, used to work out which
+    chunks have to be embedded, kept or deleted when ingestion is re-run.
+    """
+
+    def __init__(self, path="preprocessed_data/manifest.json"):
+        self.path = path
+        self.exists = os.path.exists(path)
+        self.sources = {}
+        self.seconds_per_chunk = None
+        if self.exists:
+            with open(path, "r") as f:
+                data = json.load(f)
+            self.sources = data.get("sources", {})
+            self.seconds_per_chunk = data.get("seconds_per_chunk")
+
+    def update(self, metadata, seconds_per_chunk=None):
+        sources = {}
+        for meta in metadata:
+            sources.setdefault(meta.get("source"), []).append(meta["chunkId"])
+        self.sources = sources
+        if seconds_per_chunk is not None:
+            self.seconds_per_chunk = seconds_per_chunk
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"sources": self.sources, "seconds_per_chunk": self.seconds_per_chunk}, f, indent=4)
+        os.replace(tmp_path, self.path)
+        self.exists = True
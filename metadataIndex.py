@@ -0,0 +1,105 @@
+import os
+import json
+from typing import List, Dict, Set, Tuple
+
+
+def source_type(metadata: Dict) -> str:
+    """"pdf" for textbook chunks and "web" for scraped pages; older chunks are told apart by their page number."""
+    if metadata.get("source_type"):
+        return metadata["source_type"]
+    return "pdf" if metadata.get("page") is not None else "web"
+
+
+class MetadataIndex:
+    """
+    Chunk IDs grouped by source type, source, section and page, maintained at
+    ingest so search filters are resolved without scanning the collection.
+
+    Only one (source_type, source, section, page) entry per chunk is
+    persisted; the groupings are rebuilt when the index is loaded.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.entries = {}
+        self.by_source_type = {}
+        self.by_source = {}
+        self.by_section = {}
+        self.by_page = {}
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                data = json.load(f)
+            for chunk_id, entry in data["chunks"].items():
+                self._add(chunk_id, tuple(entry))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _groups(self, entry):
+        kind, source, section, page = entry
+        return ((self.by_source_type, kind), (self.by_source, source), (self.by_section, section),
+                (self.by_page, page))
+
+    def _add(self, chunk_id: str, entry: Tuple):
+        self.entries[chunk_id] = entry
+        for groups, key in self._groups(entry):
+            if key is not None:
+                groups.setdefault(key, set()).add(chunk_id)
+
+    def add(self, chunk_ids: List[str], metadatas: List[Dict]):
+        """Index the given chunks, replacing any earlier entry with the same ID."""
+        self.remove(chunk_ids)
+        for chunk_id, metadata in zip(chunk_ids, metadatas):
+            entry = (source_type(metadata), metadata.get("source"), metadata.get("section"), metadata.get("page"))
+            self._add(str(chunk_id), entry)
+
+    def remove(self, chunk_ids: List[str]):
+        for chunk_id in map(str, chunk_ids):
+            entry = self.entries.pop(chunk_id, None)
+            if entry is None:
+                continue
+            for groups, key in self._groups(entry):
+                if key is None:
+                    continue
+                members = groups[key]
+                members.discard(chunk_id)
+                if not members:
+                    del groups[key]
+
+    def clear(self):
+        self.entries = {}
+        self.by_source_type = {}
+        self.by_source = {}
+        self.by_section = {}
+        self.by_page = {}
+
+    def sources(self, kind: str) -> List[str]:
+        """Distinct sources of the given source type."""
+        ids = self.by_source_type.get(kind, set())
+        return sorted(source for source, members in self.by_source.items() if not members.isdisjoint(ids))
+
+    def sections(self, prefix: str) -> List[str]:
+        """Distinct sections starting with `prefix`, e.g. "2." for chapter two."""
+        return sorted(section for section in self.by_section if section.startswith(prefix))
+
+    def matching(self, source_type: str = None, section_prefix: str = None, pages: Tuple[int, int] = None) -> Set[str]:
+        """IDs of the chunks that pass every given filter; `pages` is an inclusive (first, last) range."""
+        groups = []
+        if source_type is not None:
+            groups.append(self.by_source_type.get(source_type, set()))
+        if section_prefix is not None:
+            groups.append(set().union(*(self.by_section[section] for section in self.sections(section_prefix))))
+        if pages is not None:
+            first, last = pages
+            groups.append(set().union(*(members for page, members in self.by_page.items() if first <= page <= last)))
+        if not groups:
+            return set(self.entries)
+        groups.sort(key=len)
+        return set(groups[0]).intersection(*groups[1:])
+
+    def save(self, path: str = None):
+        path = path or self.path
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"chunks": self.entries}, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
@@ -0,0 +1,470 @@
+import os
+import json
+import threading
+import numpy as np
+from typing import List, Dict
+from quantization import ScalarQuantizer, ProductQuantizer, load_quantizer, save_quantizer, pq_subspaces, BLOCK_ROWS
+
+# Rows preallocated for a new matrix; it grows by doubling from there.
+MIN_CAPACITY = 1024
+
+
+class NumpyCollection:
+    """
+    Exact-search vector collection stored as a memory-mapped matrix.
+
+    Implements the subset of the Chroma collection API that VectorStore uses
+    (add, upsert, update, get, query, delete, count) and returns results in the
+    same shape. Embeddings are L2-normalized on write, so a query is a dot
+    product scanned over the matrix in blocks with a running top k, and
+    distances are reported as squared L2 like Chroma's default space. dtype="float16" halves the matrix, but every
+    exact scan upcasts it block by block, so it is several times slower to
+    query than float32; compression="int8" saves more memory at lower latency.
+
+    Writes are appends: new rows go into spare capacity of the preallocated
+    matrix file (grown by doubling), and their IDs, documents and metadata are
+    appended as one line per batch to `metadata.log`. Updating or deleting a
+    chunk only marks its old row dead. Once dead rows outnumber live ones the
+    live rows are compacted into a new generation of files together with a
+    `metadata.json` snapshot; log lines of older generations are ignored on
+    load, so a crash mid-compaction never replays a batch twice.
+
+    With `compression` set to "int8", "pq" or "auto" (int8 below
+    `pq_threshold` vectors, product quantization above), queries scan compact
+    codes kept alongside the matrix and only the best `rerank_factor * k`
+    candidates are re-ranked with exact vectors, which the memory map reads
+    from disk on demand. The quantizer is retrained at compaction, which is
+    forced whenever the corpus has doubled since the last training.
+    """
+
+    def __init__(self, path: str, dtype: str = "float32", compression: str = None, rerank_factor: int = 4,
+                 pq_threshold: int = 50000):
+        if dtype not in ("float32", "float16"):
+            raise ValueError("dtype must be 'float32' or 'float16'.")
+        if compression not in (None, "int8", "pq", "auto"):
+            raise ValueError("compression must be None, 'int8', 'pq' or 'auto'.")
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.compression = compression
+        self.rerank_factor = rerank_factor
+        self.pq_threshold = pq_threshold
+        self.metadata_path = os.path.join(path, "metadata.json")
+        self.log_path = os.path.join(path, "metadata.log")
+        self._lock = threading.RLock()
+        self._log = None
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    def _vectors_path(self, generation: int) -> str:
+        return os.path.join(self.path, f"vectors-{generation}.bin")
+
+    def _codes_path(self, generation: int) -> str:
+        return os.path.join(self.path, f"codes-{generation}.bin")
+
+    def _quantizer_path(self, generation: int) -> str:
+        return os.path.join(self.path, f"quantizer-{generation}.npz")
+
+    @staticmethod
+    def _map(path: str, dtype, width: int):
+        """Memory-map every whole row of a raw row-major file for reading and writing."""
+        capacity = os.path.getsize(path) // (width * np.dtype(dtype).itemsize)
+        if not capacity:
+            return np.zeros((0, width), dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=(capacity, width))
+
+    @staticmethod
+    def _allocate(path: str, dtype, capacity: int, width: int):
+        with open(path, "wb") as f:
+            f.truncate(capacity * width * np.dtype(dtype).itemsize)
+
+    def _load(self):
+        self.generation = 0
+        self.dim = None
+        self.matrix_dtype = self.dtype
+        self.embeddings = None
+        self.quantizer = None
+        self.codes = None
+        self.row_ids = []
+        self.documents = []
+        self.metadata_columns = {}
+        snapshot = None
+        if os.path.exists(self.metadata_path):
+            with open(self.metadata_path, "r") as f:
+                snapshot = json.load(f)
+
+        if snapshot is not None:
+            self.generation = snapshot["generation"]
+            self.dim = snapshot["dim"]
+            self.matrix_dtype = np.dtype(snapshot["dtype"])
+            self.row_ids = snapshot["ids"]
+            self.documents = snapshot["documents"]
+            self.metadata_columns = snapshot["metadatas"]
+            if self.dim:
+                self.embeddings = self._map(self._vectors_path(self.generation), self.matrix_dtype, self.dim)
+            if snapshot.get("code_width"):
+                self.quantizer = load_quantizer(self._quantizer_path(self.generation))
+                self.codes = self._map(self._codes_path(self.generation), np.uint8, snapshot["code_width"])
+
+        self.rows = len(self.row_ids)
+        self.positions = {chunk_id: i for i, chunk_id in enumerate(self.row_ids)}
+        self.dead = set()
+        self._replay()
+        self._dead_rows = None
+
+    def _replay(self):
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write.
+                    break
+                if record["g"] != self.generation:
+                    # Already folded into the snapshot by a compaction.
+                    continue
+                if record["op"] == "add":
+                    if record["row"] != self.rows:
+                        break
+                    self._apply_add(record["ids"], record["documents"], record["metadatas"])
+                elif record["op"] == "delete":
+                    self._apply_delete(record["rows"])
+
+    def _apply_add(self, ids, documents, metadatas):
+        for chunk_id, document, metadata in zip(ids, documents, metadatas):
+            i = self.rows
+            for key in metadata:
+                if key not in self.metadata_columns:
+                    self.metadata_columns[key] = [None] * i
+            for key, values in self.metadata_columns.items():
+                values.append(metadata.get(key))
+            self.row_ids.append(chunk_id)
+            self.documents.append(document)
+            previous = self.positions.get(chunk_id)
+            if previous is not None:
+                self.dead.add(previous)
+            self.positions[chunk_id] = i
+            self.rows += 1
+        self._dead_rows = None
+
+    def _apply_delete(self, rows):
+        for i in rows:
+            if self.positions.get(self.row_ids[i]) == i:
+                del self.positions[self.row_ids[i]]
+            self.dead.add(i)
+        self._dead_rows = None
+
+    def _write_log(self, record):
+        if self._log is None:
+            self._log = open(self.log_path, "a", encoding="utf-8")
+        self._log.write(json.dumps({"g": self.generation, **record}, separators=(",", ":")) + "\n")
+        self._log.flush()
+
+    def count(self) -> int:
+        return len(self.positions)
+
+    def _metadata(self, i: int) -> Dict:
+        return {key: values[i] for key, values in self.metadata_columns.items() if values[i] is not None}
+
+    def _live_rows(self) -> np.ndarray:
+        return np.array(sorted(self.positions.values()), dtype=np.int64)
+
+    def _dead_array(self) -> np.ndarray:
+        if self._dead_rows is None:
+            self._dead_rows = np.array(sorted(self.dead), dtype=np.int64)
+        return self._dead_rows
+
+    def _normalize(self, embeddings) -> np.ndarray:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+    def _quantizer_kind(self, count: int) -> str:
+        if self.compression == "auto":
+            return "pq" if count >= self.pq_threshold else "int8"
+        return self.compression
+
+    def _needs_compaction(self) -> bool:
+        live = len(self.positions)
+        if self.matrix_dtype != self.dtype:
+            return True
+        if len(self.dead) > max(live, MIN_CAPACITY):
+            return True
+        if self.compression and live:
+            quantizer = self.quantizer
+            return (quantizer is None or quantizer.kind != self._quantizer_kind(live)
+                    or live >= 2 * quantizer.trained_size)
+        return False
+
+    def _compact(self):
+        """Copy the live rows into a new generation of files and start an empty log."""
+        live = self._live_rows()
+        generation = self.generation + 1
+        capacity = max(MIN_CAPACITY, 2 * len(live))
+        vectors_path = self._vectors_path(generation)
+        self._allocate(vectors_path, self.dtype, capacity, self.dim)
+        matrix = self._map(vectors_path, self.dtype, self.dim)
+        for start in range(0, len(live), BLOCK_ROWS):
+            block = live[start:start + BLOCK_ROWS]
+            matrix[start:start + len(block)] = self.embeddings[block]
+        matrix.flush()
+
+        code_width = None
+        quantizer = codes = None
+        if self.compression and len(live):
+            kind = self._quantizer_kind(len(live))
+            quantizer = ProductQuantizer(subspaces=pq_subspaces(self.dim)) if kind == "pq" else ScalarQuantizer()
+            quantizer.fit(matrix[:len(live)])
+            code_width = quantizer.encode(matrix[:1]).shape[1]
+            codes_path = self._codes_path(generation)
+            self._allocate(codes_path, np.uint8, capacity, code_width)
+            codes = self._map(codes_path, np.uint8, code_width)
+            for start in range(0, len(live), BLOCK_ROWS):
+                end = min(start + BLOCK_ROWS, len(live))
+                codes[start:end] = quantizer.encode(matrix[start:end])
+            codes.flush()
+            save_quantizer(quantizer, self._quantizer_path(generation))
+
+        live_list = live.tolist()
+        columns = {key: [values[i] for i in live_list] for key, values in self.metadata_columns.items()}
+        snapshot = {
+            "generation": generation,
+            "dim": self.dim,
+            "dtype": self.dtype.name,
+            "code_width": code_width,
+            "ids": [self.row_ids[i] for i in live_list],
+            "documents": [self.documents[i] for i in live_list],
+            "metadatas": {key: values for key, values in columns.items() if any(v is not None for v in values)},
+        }
+        self._write_snapshot(snapshot)
+        self._switch(generation)
+        self._load()
+
+    def _write_snapshot(self, snapshot):
+        tmp_metadata = self.metadata_path + ".tmp"
+        with open(tmp_metadata, "w") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        # Replacing the snapshot is what makes the new generation current.
+        os.replace(tmp_metadata, self.metadata_path)
+
+    def _switch(self, generation: int):
+        """Drop the files of every older generation, and the log they used."""
+        self.embeddings = None
+        self.codes = None
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        open(self.log_path, "w").close()
+        for name in os.listdir(self.path):
+            prefix, _, rest = name.partition("-")
+            if prefix in ("vectors", "codes", "quantizer") and rest.split(".")[0] != str(generation):
+                os.remove(os.path.join(self.path, name))
+
+    def _reserve(self, count: int):
+        """Grow the matrix (and codes) files so `count` more rows fit."""
+        capacity = len(self.embeddings)
+        if self.rows + count <= capacity:
+            return
+        capacity = max(2 * capacity, self.rows + count, MIN_CAPACITY)
+        files = [(self._vectors_path(self.generation), self.matrix_dtype, self.dim)]
+        if self.codes is not None:
+            files.append((self._codes_path(self.generation), np.uint8, self.codes.shape[1]))
+        self.embeddings.flush()
+        self.embeddings = None
+        if self.codes is not None:
+            self.codes.flush()
+            self.codes = None
+        for path, dtype, width in files:
+            with open(path, "r+b") as f:
+                f.truncate(capacity * width * np.dtype(dtype).itemsize)
+        self.embeddings = self._map(files[0][0], self.matrix_dtype, self.dim)
+        if len(files) > 1:
+            self.codes = self._map(files[1][0], np.uint8, files[1][2])
+
+    def _append(self, ids, documents, metadatas, vectors: np.ndarray):
+        if not ids:
+            return
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self.embeddings = np.zeros((0, self.dim), dtype=self.dtype)
+        if self.matrix_dtype != self.dtype or not len(self.embeddings):
+            self._compact()
+
+        self._reserve(len(ids))
+        start = self.rows
+        self.embeddings[start:start + len(ids)] = vectors
+        self.embeddings.flush()
+        if self.codes is not None:
+            self.codes[start:start + len(ids)] = self.quantizer.encode(vectors)
+            self.codes.flush()
+        # The log line is written last, so a crash before it leaves only unused spare rows.
+        self._write_log({"op": "add", "row": start, "ids": ids, "documents": documents, "metadatas": metadatas})
+        self._apply_add(ids, documents, metadatas)
+        if self._needs_compaction():
+            self._compact()
+
+    def memory_footprint(self) -> Dict:
+        """Bytes needed in memory to scan the index, compressed or not."""
+        live = len(self.positions)
+        dim = self.dim or 0
+        footprint = {"vectors": live, "float32_bytes": live * dim * 4,
+                     "stored_bytes": live * dim * self.matrix_dtype.itemsize}
+        if self.codes is not None:
+            footprint["codes_bytes"] = int(live * self.codes.shape[1])
+            footprint["quantizer_bytes"] = int(self.quantizer.nbytes())
+        return footprint
+
+    def _merge(self, ids, documents, embeddings, metadatas, allow_new: bool, allow_existing: bool):
+        with self._lock:
+            new_vectors = self._normalize(embeddings) if embeddings is not None else None
+            rows = []
+            for j, chunk_id in enumerate(ids):
+                i = self.positions.get(chunk_id)
+                if i is None and not allow_new:
+                    continue
+                if i is not None and not allow_existing:
+                    raise ValueError(f"ID already exists: {chunk_id}")
+                if i is None and new_vectors is None:
+                    raise ValueError("Embeddings are required for new IDs.")
+                rows.append((j, i))
+
+            if not rows:
+                return
+            vectors = np.empty((len(rows), self.dim or new_vectors.shape[1]), dtype=np.float32)
+            out_ids, out_documents, out_metadatas = [], [], []
+            for n, (j, i) in enumerate(rows):
+                vectors[n] = new_vectors[j] if new_vectors is not None else self.embeddings[i]
+                out_ids.append(ids[j])
+                out_documents.append(documents[j] if documents is not None else
+                                     (self.documents[i] if i is not None else None))
+                out_metadatas.append(metadatas[j] if metadatas is not None else
+                                     (self._metadata(i) if i is not None else {}))
+            self._append(out_ids, out_documents, out_metadatas, vectors)
+
+    def add(self, ids: List[str], documents=None, embeddings=None, metadatas=None):
+        self._merge(ids, documents, embeddings, metadatas, allow_new=True, allow_existing=False)
+
+    def upsert(self, ids: List[str], documents=None, embeddings=None, metadatas=None):
+        self._merge(ids, documents, embeddings, metadatas, allow_new=True, allow_existing=True)
+
+    def update(self, ids: List[str], documents=None, embeddings=None, metadatas=None):
+        self._merge(ids, documents, embeddings, metadatas, allow_new=False, allow_existing=True)
+
+    def delete(self, ids: List[str] = None):
+        with self._lock:
+            rows = [self.positions[chunk_id] for chunk_id in dict.fromkeys(ids or []) if chunk_id in self.positions]
+            if not rows:
+                return
+            self._write_log({"op": "delete", "rows": rows})
+            self._apply_delete(rows)
+            if self._needs_compaction():
+                self._compact()
+
+    def reset(self):
+        with self._lock:
+            self._write_snapshot({"generation": self.generation + 1, "dim": None, "dtype": self.dtype.name,
+                                  "code_width": None, "ids": [], "documents": [], "metadatas": {}})
+            self._switch(self.generation + 1)
+            self._load()
+
+    def get(self, ids: List[str] = None, include=("documents", "metadatas")) -> Dict:
+        with self._lock:
+            if ids is None:
+                positions = self._live_rows().tolist()
+            else:
+                positions = [self.positions[chunk_id] for chunk_id in ids if chunk_id in self.positions]
+            return self._results(positions, include)
+
+    def _results(self, positions, include) -> Dict:
+        results = {"ids": [self.row_ids[i] for i in positions]}
+        if "documents" in include:
+            results["documents"] = [self.documents[i] for i in positions]
+        if "metadatas" in include:
+            results["metadatas"] = [self._metadata(i) for i in positions]
+        if "embeddings" in include:
+            results["embeddings"] = [np.array(self.embeddings[i], dtype=np.float32) for i in positions]
+        return results
+
+    def query(self, query_embeddings, n_results: int = 10, include=("documents", "metadatas", "distances"),
+              ids: List[str] = None) -> Dict:
+        """
+        Exact top-k search for one or more query embeddings in one matrix
+        product, optionally only over the rows with the given `ids`.
+        """
+        with self._lock:
+            keys = ["ids", "documents", "metadatas", "distances", "embeddings"]
+            results = {key: [] for key in keys if key == "ids" or key in include}
+            queries = self._normalize(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+            rows = None
+            if ids is not None:
+                rows = np.array(sorted(self.positions[chunk_id] for chunk_id in ids if chunk_id in self.positions),
+                                dtype=np.int64)
+            if not self.positions or (rows is not None and not len(rows)):
+                for key in results:
+                    results[key] = [[] for _ in queries]
+                return results
+
+            k = min(n_results, len(self.positions) if rows is None else len(rows))
+            if self.codes is not None:
+                matches = [self._compressed_search(query, k, rows) for query in queries]
+            else:
+                matches = self._exact_search(queries, k, rows)
+
+            for positions, scores in matches:
+                positions = positions.tolist()
+                found = self._results(positions, include)
+                for key in results:
+                    if key == "distances":
+                        # For unit vectors the squared L2 distance is 2 - 2 * cosine similarity.
+                        results[key].append([float(2.0 - 2.0 * score) for score in scores])
+                    else:
+                        results[key].append(found[key])
+            return results
+
+    def _exact_search(self, queries: np.ndarray, k: int, rows: np.ndarray = None):
+        """
+        Score the stored vectors in blocks of BLOCK_ROWS, keeping a running top
+        k per query, so float16 storage is upcast one block at a time instead
+        of as a full float32 copy of the matrix.
+        """
+        total = self.rows if rows is None else len(rows)
+        dead = self._dead_array() if rows is None else None
+        best = [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in queries]
+        for start in range(0, total, BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, total)
+            if rows is None:
+                positions = np.arange(start, end)
+                block = self.embeddings[start:end]
+            else:
+                positions = rows[start:end]
+                block = self.embeddings[positions]
+            scores = queries @ np.asarray(block, dtype=np.float32).T
+            if dead is not None and len(dead):
+                in_block = dead[(dead >= start) & (dead < end)]
+                scores[:, in_block - start] = -np.inf
+            for q, (best_positions, best_scores) in enumerate(best):
+                candidate_positions = np.concatenate([best_positions, positions])
+                candidate_scores = np.concatenate([best_scores, scores[q]])
+                top = self._top_k(candidate_scores, min(k, len(candidate_scores)))
+                best[q] = candidate_positions[top], candidate_scores[top]
+        return best
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        return top[np.argsort(-scores[top])]
+
+    def _compressed_search(self, query: np.ndarray, k: int, rows: np.ndarray = None):
+        codes = self.codes[:self.rows] if rows is None else self.codes[rows]
+        approximate = self.quantizer.scores(codes, query)
+        if rows is None:
+            approximate[self._dead_array()] = -np.inf
+        live = len(self.positions) if rows is None else len(rows)
+        candidates = self._top_k(approximate, min(live, k * self.rerank_factor))
+        candidates = np.sort(candidates if rows is None else rows[candidates])
+        exact = np.asarray(self.embeddings[candidates], dtype=np.float32) @ query
+        top = self._top_k(exact, k)
+        return candidates[top], exact[top]
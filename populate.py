@@ -1,55 +1,116 @@
-import os
-import json
-from preprocessor import Preprocessor
-from vectorStorage import VectorStore
-
-def main():
-    pdf_path = "rawInput/grade-11-history-text-book.pdf"
-    output_dir = "preprocessed_data"
-    db_directory = './chroma'
-    chunk_size = 100
-
-    urls_to_scrape = [
-        "https://kids.nationalgeographic.com/history/article/wright-brothers",
-        "https://en.wikipedia.org/wiki/Wright_Flyer",
-        "https://airandspace.si.edu/collection-objects/1903-wright-flyer/nasm_A19610048000",
-        "https://en.wikipedia.org/wiki/Wright_brothers",
-        "https://spacecenter.org/a-look-back-at-the-wright-brothers-first-flight/",
-        "https://udithadevapriya.medium.com/a-history-of-education-in-sri-lanka-bf2d6de2882c",
-        "https://en.wikipedia.org/wiki/Education_in_Sri_Lanka",
-        "https://thuppahis.com/2018/05/16/the-earliest-missionary-english-schools-challenging-shirley-somanader/",
-        "https://www.elivabooks.com/pl/book/book-6322337660",
-        "https://quizgecko.com/learn/christian-missionary-organizations-in-sri-lanka-bki3tu",
-        "https://en.wikipedia.org/wiki/Mahaweli_Development_programme",
-        "https://www.cmg.lk/largest-irrigation-project",
-        "https://mahaweli.gov.lk/Corporate%20Plan%202019%20-%202023.pdf",
-        "https://www.sciencedirect.com/science/article/pii/S0016718524002082",
-        "https://www.sciencedirect.com/science/article/pii/S2405844018381635",
-        "https://www.britannica.com/story/did-marie-antoinette-really-say-let-them-eat-cake",
-        "https://genikuckhahn.blog/2023/06/10/marie-antoinette-and-the-infamous-phrase-did-she-really-say-let-them-eat-cake/",
-        "https://www.instagram.com/mottahedehchina/p/Cx07O8XMR8U/?hl=en",
-        "https://www.reddit.com/r/HistoryMemes/comments/rqgcjs/let_them_eat_cake_is_the_most_famous_quote/",
-        "https://www.history.com/news/did-marie-antoinette-really-say-let-them-eat-cake",
-        "https://encyclopedia.ushmm.org/content/en/article/adolf-hitler-early-years-1889-1921",
-        "https://en.wikipedia.org/wiki/Adolf_Hitler",
-        "https://encyclopedia.ushmm.org/content/en/article/adolf-hitler-early-years-1889-1913",
-        "https://www.history.com/articles/adolf-hitler",
-        "https://www.bbc.co.uk/teach/articles/zbrx8xs"
-    ]
-
-    print("Starting preprocessing of PDF and URLs...")
-    preprocessor = Preprocessor(pdf_path, output_dir, chunk_size)
-    all_chunks, all_metadata = preprocessor.preprocess_and_store(urls_to_scrape)
-
-    print(f"Preprocessing complete. {len(all_chunks)} chunks created and saved to {output_dir}/chunksWithMetadata.json.")
-
-    print("Initializing VectorStore and storing data...")
-    vector_storage = VectorStore(db_directory)
-    if len(all_chunks) == len(all_metadata):
-        vector_storage.insert(all_chunks, all_metadata)
-        print("Data successfully stored in Chroma database.")
-    else:
-        raise ValueError(f"Number of chunks ({len(all_chunks)}) does not match number of metadata entries ({len(all_metadata)}).")
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+import os
+import time
+import logging
+from preprocessor import Preprocessor
+from fetchCache import FetchCache
+from manifest import ChunkManifest
+from vectorStorage import VectorStore
+from instrumentation import configure_logging, profiling, metrics
+
+logger = logging.getLogger(__name__)
+
+def main():
+    pdf_path = "rawInput/grade-11-history-text-book.pdf"
+    output_dir = "preprocessed_data"
+    db_directory = './chroma'
+    chunk_size = 100
+    batch_size = 256
+    workers = os.cpu_count() or 1
+    offline = os.getenv("INGEST_OFFLINE") == "1"
+
+    urls_to_scrape = [
+        "https://kids.nationalgeographic.com/history/article/wright-brothers",
+        "https://en.wikipedia.org/wiki/Wright_Flyer",
+        "https://airandspace.si.edu/collection-objects/1903-wright-flyer/nasm_A19610048000",
+        "https://en.wikipedia.org/wiki/Wright_brothers",
+        "https://spacecenter.org/a-look-back-at-the-wright-brothers-first-flight/",
+        "https://udithadevapriya.medium.com/a-history-of-education-in-sri-lanka-bf2d6de2882c",
+        "https://en.wikipedia.org/wiki/Education_in_Sri_Lanka",
+        "https://thuppahis.com/2018/05/16/the-earliest-missionary-english-schools-challenging-shirley-somanader/",
+        "https://www.elivabooks.com/pl/book/book-6322337660",
+        "https://quizgecko.com/learn/christian-missionary-organizations-in-sri-lanka-bki3tu",
+        "https://en.wikipedia.org/wiki/Mahaweli_Development_programme",
+        "https://www.cmg.lk/largest-irrigation-project",
+        "https://mahaweli.gov.lk/Corporate%20Plan%202019%20-%202023.pdf",
+        "https://www.sciencedirect.com/science/article/pii/S0016718524002082",
+        "https://www.sciencedirect.com/science/article/pii/S2405844018381635",
+        "https://www.britannica.com/story/did-marie-antoinette-really-say-let-them-eat-cake",
+        "https://genikuckhahn.blog/2023/06/10/marie-antoinette-and-the-infamous-phrase-did-she-really-say-let-them-eat-cake/",
+        "https://www.instagram.com/mottahedehchina/p/Cx07O8XMR8U/?hl=en",
+        "https://www.reddit.com/r/HistoryMemes/comments/rqgcjs/let_them_eat_cake_is_the_most_famous_quote/",
+        "https://www.history.com/news/did-marie-antoinette-really-say-let-them-eat-cake",
+        "https://encyclopedia.ushmm.org/content/en/article/adolf-hitler-early-years-1889-1921",
+        "https://en.wikipedia.org/wiki/Adolf_Hitler",
+        "https://encyclopedia.ushmm.org/content/en/article/adolf-hitler-early-years-1889-1913",
+        "https://www.history.com/articles/adolf-hitler",
+        "https://www.bbc.co.uk/teach/articles/zbrx8xs"
+    ]
+
+    logger.info("Starting preprocessing of PDF and URLs...")
+    cache = FetchCache(os.path.join(output_dir, "fetch_cache"), offline=offline)
+    preprocessor = Preprocessor(pdf_path, output_dir, chunk_size, workers=workers, cache=cache)
+
+    logger.info("Initializing VectorStore and storing data...")
+    vector_storage = VectorStore(db_directory)
+    manifest = ChunkManifest(os.path.join(output_dir, "manifest.json"))
+    # Chunk IDs are content hashes, so anything already stored is up to date.
+    # That also makes an interrupted run resume where it stopped.
+    stored = set(vector_storage.ids())
+    # Without a manifest (first run, or a store filled by an older version with
+    # positional IDs) removals are worked out against what is already stored.
+    if manifest.exists:
+        previous = {source: set(ids) for source, ids in manifest.sources.items()}
+    else:
+        if len(vector_storage.metadata_index) != len(stored):
+            vector_storage.rebuild_indexes()
+        previous = {}
+        for chunk_id, (_, source, _, _) in vector_storage.metadata_index.entries.items():
+            previous.setdefault(source, set()).add(chunk_id)
+    current = []
+    unchanged = 0
+
+    def new_chunks():
+        nonlocal unchanged
+        for chunk, meta in preprocessor.iter_chunks(urls_to_scrape):
+            current.append({"chunkId": meta["chunkId"], "source": meta.get("source")})
+            if meta["chunkId"] in stored:
+                unchanged += 1
+            else:
+                yield chunk, meta
+
+    # Chunks are embedded and stored while later pages and URLs are still being processed.
+    start = time.perf_counter()
+    embed_start = metrics.total_ms("embed") + metrics.total_ms("upsert")
+    added = vector_storage.insert_stream(new_chunks(), batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    # Fetching and parsing run inside the same stream, so the per-chunk cost
+    # of re-embedding is taken from the embed and upsert spans alone.
+    embed_seconds = (metrics.total_ms("embed") + metrics.total_ms("upsert") - embed_start) / 1000
+    # A source that could not be fetched this time (network error, or not
+    # cached under offline ingest) keeps the chunks stored for it last time.
+    for source in preprocessor.failed_sources & set(previous):
+        logger.warning("Keeping %d stored chunks of %s, which could not be fetched.", len(previous[source]), source)
+        current.extend({"chunkId": chunk_id, "source": source} for chunk_id in sorted(previous[source]))
+    removed = set().union(*previous.values()) - {meta["chunkId"] for meta in current}
+    if removed:
+        vector_storage.delete(sorted(removed))
+    stored_count = vector_storage.collection.count()
+    if len(vector_storage.lexical_index) != stored_count or len(vector_storage.metadata_index) != stored_count:
+        vector_storage.rebuild_indexes()
+
+    seconds_per_chunk = embed_seconds / added if added else None
+    manifest.update(current, seconds_per_chunk)
+    manifest.save()
+    cache.close()
+
+    logger.info("Chunks added: %d, unchanged: %d, removed: %d.", added, unchanged, len(removed))
+    if manifest.seconds_per_chunk:
+        logger.info("Ingestion took %.2fs, %.2fs of it embedding and storing; "
+                    "skipping unchanged chunks saved about %.2fs.",
+                    elapsed, embed_seconds, manifest.seconds_per_chunk * unchanged)
+    logger.info("Data successfully stored in Chroma database.")
+
+if __name__ == "__main__":
+    configure_logging()
+    with profiling("populate"):
+        main()
\ No newline at end of file
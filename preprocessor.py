@@ -1,188 +1,282 @@
-import fitz
-import re
-import json
-import os
-from nltk.tokenize import sent_tokenize
-from nltk.tokenize import word_tokenize
-from bs4 import BeautifulSoup
-import requests
-
-class Preprocessor:
-    def __init__(self, pdfPath=None, outputDir="preprocessed_data", chunkSize=100):
-        self.pdfPath = pdfPath
-        self.outputDir = outputDir
-        self.chunkSize = chunkSize
-        self.chunks = []
-        self.metadata = []
-        self.global_chunk_id = 0
-
-    def clean_text(self, text):
-        text = re.sub(r'\s+', ' ', text).strip()
-        return text
-
-    def scrape_text_from_url(self, url):
-        try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-
-            article_content = soup.find('article')
-            if not article_content:
-                article_content = soup.find('div', {'class': 'article-body'})
-            if not article_content:
-                article_content = soup.find('main')
-            if not article_content:
-                article_content = soup.find('body')
-
-            if article_content:
-                text = article_content.get_text(separator='\n', strip=True)
-                return self.clean_text(text)
-            else:
-                print(f"Warning: Could not find main content for URL: {url}")
-                return None
-
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching URL {url}: {e}")
-            return None
-        except Exception as e:
-            print(f"Error processing content from {url}: {e}")
-            return None
-
-    def chunk_and_annotate_text(self, text, source_url):
-        text_chunks = []
-        metadata_list = []
-        sentences = sent_tokenize(text)
-        current_chunk = ""
-
-        for sentence in sentences:
-            if len(word_tokenize(current_chunk + " " + sentence)) <= self.chunkSize:
-                current_chunk += " " + sentence
-            else:
-                if current_chunk.strip():
-                    text_chunks.append(current_chunk.strip())
-                    metadata_list.append({
-                        "chunkId": self.global_chunk_id,
-                        "source": source_url,
-                        "section": source_url,
-                        "text": current_chunk.strip()
-                    })
-                    self.global_chunk_id += 1
-                current_chunk = sentence.strip()
-
-        if current_chunk.strip():
-            text_chunks.append(current_chunk.strip())
-            metadata_list.append({
-                "chunkId": self.global_chunk_id,
-                "source": source_url,
-                "section": source_url,
-                "text": current_chunk.strip()
-            })
-            self.global_chunk_id += 1 
-
-        return text_chunks, metadata_list
-
-    def process_pdf(self):
-        self.chunks = []
-        self.metadata = []
-        doc = fitz.open(self.pdfPath)
-        current_section = ""
-        current_page = 1
-
-        for page_num in range(len(doc)):
-            page_text = doc.load_page(page_num).get_text().splitlines()
-            current_content_in_section = ""
-
-            for line in page_text:
-                page_number_match = re.match(r'^\s*-\s*(\d+)\s*-?\s*$', line)
-                if page_number_match:
-                    current_page = int(page_number_match.group(1))
-                    print(f"  >> Page Number Found (PDF): {current_page}")
-                    continue
-
-                section_match = re.match(r'^\s*\d+\.\d+(\.\s+)?\s*.+$', line) or re.match(r'^\s*\s*.+$', line)
-                if section_match:
-                    current_section = line.strip()
-                    print(f"  >> Section Found (PDF): '{current_section}'")
-                    continue
-
-                if line.strip():
-                    sentences = sent_tokenize(line)
-                    for sentence in sentences:
-                        temp_content = (current_content_in_section + " " + sentence).strip()
-                        if len(word_tokenize(temp_content)) <= self.chunkSize - len(word_tokenize(current_section)) - 5:
-                            current_content_in_section = temp_content
-                        else:
-                            if current_content_in_section:
-                                chunk_text = f"{current_section}. {current_content_in_section}"
-                                self.chunks.append(chunk_text)
-                                self.metadata.append({
-                                    "chunkId": self.global_chunk_id,
-                                    "page": current_page,
-                                    "section": current_section,
-                                    "source": self.pdfPath,
-                                    "text": chunk_text
-                                })
-                                self.global_chunk_id += 1
-                                current_content_in_section = sentence.strip()
-
-            if current_content_in_section.strip():
-                chunk_text = f"{current_section}. {current_content_in_section}"
-                self.chunks.append(chunk_text)
-                self.metadata.append({
-                    "chunkId": self.global_chunk_id,
-                    "page": current_page,
-                    "section": current_section,
-                    "source": self.pdfPath,
-                    "text": chunk_text
-                })
-                self.global_chunk_id += 1 
-
-        return self.chunks, self.metadata
-
-    def process_urls(self, urls):
-        all_url_chunks = []
-        all_url_metadata = []
-        for url in urls:
-            print(f"Processing URL: {url}")
-            text = self.scrape_text_from_url(url)
-            if text:
-                chunks, metadata = self.chunk_and_annotate_text(text, url)
-                all_url_chunks.extend(chunks)
-                all_url_metadata.extend(metadata)
-        return all_url_chunks, all_url_metadata
-
-    def saveChunksAndMetadata(self, chunks, metadata):
-        if not os.path.exists(self.outputDir):
-            os.makedirs(self.outputDir)
-        outputPath = os.path.join(self.outputDir, 'chunksWithMetadata.json')
-        with open(outputPath, 'w') as f:
-            json.dump({"chunks": chunks, "metadata": metadata}, f, indent=4)
-
-    def preprocess_and_store(self, urls=None):
-        all_chunks = []
-        all_metadata = []
-        self.global_chunk_id = 0
-
-        if self.pdfPath:
-            pdf_chunks, pdf_metadata = self.process_pdf()
-            all_chunks.extend(pdf_chunks)
-            all_metadata.extend(pdf_metadata)
-
-        if urls:
-            url_chunks, url_metadata = self.process_urls(urls)
-            all_chunks.extend(url_chunks)
-            all_metadata.extend(url_metadata)
-
-
-        if len(all_chunks) == len(all_metadata):
-            updated_metadata = []
-            for i, meta in enumerate(all_metadata):
-                updated_metadata.append({**meta, "chunkId": i})
-            self.chunks = all_chunks
-            self.metadata = updated_metadata
-        else:
-            raise ValueError("Number of chunks and metadata do not match after processing.")
-
-        self.saveChunksAndMetadata(self.chunks, self.metadata)
-        print(f"Preprocessing complete. {len(self.chunks)} chunks created and saved to {os.path.join(self.outputDir, 'chunksWithMetadata.json')}.")
-        return self.chunks, self.metadata
\ No newline at end of file
+import re
+import json
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from chunker import StreamingChunker
+from fetcher import Fetcher
+from fetchCache import FetchCache
+from manifest import iter_chunk_ids
+from instrumentation import span, timed_iter, increment
+
+logger = logging.getLogger(__name__)
+
+
+PAGE_NUMBER_PATTERN = re.compile(r'^\s*-\s*(\d+)\s*-?\s*$')
+NUMBERED_SECTION_PATTERN = re.compile(r'^\s*\d+\.\d+(\.\s+)?\s*.+$')
+SECTION_PATTERN = re.compile(r'^\s*\s*.+$')
+CHUNKS_FILE = "chunks.jsonl"
+
+
+def extract_pdf_pages(pdf_path, start_page, end_page):
+    """
+    Extract pages [start_page, end_page) of a PDF into per-page event lists.
+
+    Each event is ("page", number), ("section", heading, token_count) or
+    ("sentence", text, token_count). Events only depend on the page text, so
+    page ranges can be extracted in separate processes and replayed in order.
+    """
+    import fitz
+    from nltk.tokenize import sent_tokenize, word_tokenize
+
+    doc = fitz.open(pdf_path)
+    pages = []
+    for page_num in range(start_page, end_page):
+        events = []
+        for line in doc.load_page(page_num).get_text().splitlines():
+            page_number_match = PAGE_NUMBER_PATTERN.match(line)
+            if page_number_match:
+                events.append(("page", int(page_number_match.group(1))))
+                continue
+
+            section_match = NUMBERED_SECTION_PATTERN.match(line) or SECTION_PATTERN.match(line)
+            if section_match:
+                section = line.strip()
+                events.append(("section", section, len(word_tokenize(section))))
+                continue
+
+            if line.strip():
+                for sentence in sent_tokenize(line):
+                    events.append(("sentence", sentence, len(word_tokenize(sentence))))
+        pages.append(events)
+    doc.close()
+    return pages
+
+
+def extract_article_text(content, url=None):
+    """Select the main article content of an HTML page and return it as clean text."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, 'html.parser')
+
+    article_content = soup.find('article')
+    if not article_content:
+        article_content = soup.find('div', {'class': 'article-body'})
+    if not article_content:
+        article_content = soup.find('main')
+    if not article_content:
+        article_content = soup.find('body')
+
+    if article_content:
+        text = article_content.get_text(separator='\n', strip=True)
+        return re.sub(r'\s+', ' ', text).strip()
+    else:
+        logger.warning("Could not find main content for URL: %s", url)
+        return None
+
+
+def read_chunks(path):
+    """Yield (chunk_text, metadata) pairs from a chunks.jsonl file written by Preprocessor.iter_chunks."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            yield record.pop("text"), record
+
+
+class Preprocessor:
+    def __init__(self, pdfPath=None, outputDir="preprocessed_data", chunkSize=100, chunkOverlap=0, workers=1, fetcher=None, cache=None):
+        self.pdfPath = pdfPath
+        self.outputDir = outputDir
+        self.chunkSize = chunkSize
+        self.chunkOverlap = chunkOverlap
+        self.workers = workers or 1
+        self.fetcher = fetcher or Fetcher(parse_workers=self.workers if self.workers > 1 else 0)
+        self.cache = cache
+        self.chunks = []
+        self.metadata = []
+        # URLs of the last run that could not be fetched or parsed.
+        self.failed_sources = set()
+
+    def clean_text(self, text):
+        text = re.sub(r'\s+', ' ', text).strip()
+        return text
+
+    def scrape_text_from_url(self, url):
+        content = self._fetch_url(url)
+        if content is None or isinstance(content, str):
+            return content
+        try:
+            text = extract_article_text(content, url)
+        except Exception as e:
+            logger.warning("Error processing content from %s: %s", url, e)
+            return None
+        if text and self.cache:
+            self.cache.put_text(FetchCache.url_key(url), text)
+        return text
+
+    def _fetch_url(self, url):
+        """Return the page body, or its already extracted text when the cached copy is still valid."""
+        if not self.cache:
+            return self.fetcher.fetch(url)
+        body, changed = self.cache.fetch(url, self.fetcher)
+        if body is not None and not changed:
+            text = self.cache.get_text(FetchCache.url_key(url))
+            if text is not None:
+                return text
+        return body
+
+    def chunk_and_annotate_text(self, text, source_url):
+        return self._collect(self._iter_text_chunks(text, source_url))
+
+    def _iter_text_chunks(self, text, source_url):
+        from nltk.tokenize import sent_tokenize
+
+        chunker = StreamingChunker(self.chunkSize, overlap=self.chunkOverlap)
+        with span("chunk"):
+            chunks = list(chunker.chunk(sent_tokenize(text)))
+        for chunk_text in chunks:
+            yield chunk_text, {"source": source_url, "source_type": "web", "section": source_url}
+
+    def _collect(self, items):
+        """Materialize a chunk stream as (chunks, metadata) lists with the same content-hash IDs as iter_chunks."""
+        text_chunks = []
+        metadata_list = []
+        for chunk_text, meta in iter_chunk_ids(items):
+            text_chunks.append(chunk_text)
+            metadata_list.append({**meta, "text": chunk_text})
+        return text_chunks, metadata_list
+
+    def process_pdf(self):
+        self.chunks, self.metadata = self._collect(self._iter_pdf_chunks())
+        return self.chunks, self.metadata
+
+    def _iter_pdf_chunks(self):
+        chunker = StreamingChunker(self.chunkSize, overlap=self.chunkOverlap, keep_oversized=False)
+        current_section = ""
+        section_limit = self.chunkSize - 5
+        current_page = 1
+
+        for events in timed_iter("parse_pdf", self._extract_pdf_pages()):
+            increment("pdf_pages")
+            chunker.reset()
+            page_chunks = []
+
+            # A page's chunks are collected before they are yielded so the
+            # span does not include the time the consumer spends on them.
+            with span("chunk"):
+                for event in events:
+                    if event[0] == "page":
+                        current_page = event[1]
+                        logger.debug("Page number found (PDF): %s", current_page)
+                    elif event[0] == "section":
+                        current_section = event[1]
+                        section_limit = self.chunkSize - event[2] - 5
+                        logger.debug("Section found (PDF): '%s'", current_section)
+                    else:
+                        content = chunker.add(event[1], limit=section_limit, token_count=event[2])
+                        if content:
+                            page_chunks.append(self._pdf_chunk(current_section, current_page, content))
+
+                content = chunker.flush()
+                if content:
+                    page_chunks.append(self._pdf_chunk(current_section, current_page, content))
+            yield from page_chunks
+
+    def _extract_pdf_pages(self):
+        if not self.cache:
+            yield from self._extract_pdf_page_ranges()
+            return
+
+        key = FetchCache.pdf_key(self.pdfPath)
+        cached = self.cache.get_text(key)
+        if cached is not None:
+            yield from json.loads(cached)
+            return
+
+        pages = list(self._extract_pdf_page_ranges())
+        self.cache.put_text(key, json.dumps(pages))
+        yield from pages
+
+    def _extract_pdf_page_ranges(self):
+        import fitz
+
+        with fitz.open(self.pdfPath) as doc:
+            page_count = len(doc)
+
+        if self.workers <= 1 or page_count < 2:
+            yield from extract_pdf_pages(self.pdfPath, 0, page_count)
+            return
+
+        # Several small ranges per worker keep the pool busy when some pages are
+        # much heavier than others. map() returns the ranges in page order, so
+        # section and page number state is carried across them exactly as in a
+        # sequential run.
+        range_size = max(1, page_count // (self.workers * 4))
+        starts = list(range(0, page_count, range_size))
+        ends = [min(start + range_size, page_count) for start in starts]
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            for pages in executor.map(extract_pdf_pages, [self.pdfPath] * len(starts), starts, ends):
+                yield from pages
+
+    def _pdf_chunk(self, section, page, content):
+        return f"{section}. {content}", {"page": page, "section": section, "source": self.pdfPath, "source_type": "pdf"}
+
+    def process_urls(self, urls):
+        return self._collect(self._iter_url_chunks(urls))
+
+    def _iter_url_chunks(self, urls):
+        # Pages are downloaded and parsed concurrently but come back in input
+        # order, so chunk IDs do not depend on which site answered first.
+        cached_urls = set()
+
+        def fetch(url):
+            content = self._fetch_url(url)
+            if isinstance(content, str):
+                cached_urls.add(url)
+            return content
+
+        self.failed_sources = set()
+        for url, text in self.fetcher.iter_fetch(urls, parse=extract_article_text, fetch=fetch):
+            logger.info("Processing URL: %s", url)
+            if text is None:
+                self.failed_sources.add(url)
+            if text and self.cache and url not in cached_urls:
+                self.cache.put_text(FetchCache.url_key(url), text)
+            if text:
+                yield from self._iter_text_chunks(text, url)
+
+    def iter_chunks(self, urls=None):
+        """
+        Yield (chunk_text, metadata) pairs for the PDF and then the URLs as
+        soon as each chunk is produced, with content-hash chunk IDs.
+
+        Every chunk is also appended to `outputDir`/chunks.jsonl, one JSON
+        record per line with the text stored once. The file replaces the
+        previous one when the stream has been consumed to the end.
+        """
+        os.makedirs(self.outputDir, exist_ok=True)
+        output_path = os.path.join(self.outputDir, CHUNKS_FILE)
+        tmp_path = output_path + ".tmp"
+        count = 0
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for chunk_text, meta in iter_chunk_ids(self._iter_sources(urls)):
+                f.write(json.dumps({**meta, "text": chunk_text}, ensure_ascii=False) + "\n")
+                count += 1
+                increment("chunks")
+                yield chunk_text, meta
+        os.replace(tmp_path, output_path)
+        logger.info("Preprocessing complete. %d chunks created and saved to %s.", count, output_path)
+
+    def _iter_sources(self, urls):
+        if self.pdfPath:
+            yield from self._iter_pdf_chunks()
+        if urls:
+            yield from self._iter_url_chunks(urls)
+
+    def preprocess_and_store(self, urls=None):
+        self.chunks = []
+        self.metadata = []
+        for chunk_text, meta in self.iter_chunks(urls):
+            self.chunks.append(chunk_text)
+            self.metadata.append(meta)
+        return self.chunks, self.metadata
@@ -0,0 +1,112 @@
+import re
+from typing import List, Dict
+from instrumentation import span, increment
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Word and punctuation count, a fast local stand-in for the model tokenizer."""
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def shingles(text: str, size: int = 3) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class PromptBuilder:
+    """
+    Packs retrieved chunks into the context of a prompt.
+
+    Chunks are taken in retrieval order. A chunk whose word 3-grams are at
+    least `dedup_threshold` contained in an already kept chunk is dropped, as
+    is any chunk that would push the context past `token_budget` estimated
+    tokens. The kept chunks are then grouped by source, section and page,
+    ordered by page, and every group is merged into one passage with the
+    section heading written once. Content-hash chunk IDs carry no position,
+    so chunks of a group are merged whether or not they were consecutive in
+    the source; a section page is short enough for that to read as one
+    passage.
+    """
+
+    def __init__(self, token_budget: int = 1500, dedup_threshold: float = 0.8):
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+
+    def _duplicate(self, candidate: set, kept: List[set]) -> bool:
+        for other in kept:
+            overlap = len(candidate & other) / max(1, min(len(candidate), len(other)))
+            if overlap >= self.dedup_threshold:
+                return True
+        return False
+
+    def _select(self, items: List[Dict]):
+        selected, kept_shingles = [], []
+        duplicates = over_budget = 0
+        used = 0
+        for item in items:
+            item_shingles = shingles(item["text"])
+            if self._duplicate(item_shingles, kept_shingles):
+                duplicates += 1
+                continue
+            tokens = estimate_tokens(item["text"])
+            if used + tokens > self.token_budget:
+                over_budget += 1
+                continue
+            used += tokens
+            selected.append(item)
+            kept_shingles.append(item_shingles)
+        return selected, duplicates, over_budget
+
+    @staticmethod
+    def _merge(items: List[Dict]) -> List[str]:
+        groups = {}
+        source_rank = {}
+        for rank, item in enumerate(items):
+            source = item.get("source") or item.get("section")
+            source_rank.setdefault(source, rank)
+            key = (source, item.get("section"), item.get("page"))
+            groups.setdefault(key, {"rank": rank, "items": []})["items"].append(item)
+
+        def order(entry):
+            (source, _, page), group = entry
+            return source_rank[source], page if isinstance(page, int) else -1, group["rank"]
+
+        passages = []
+        for (_, section, _), group in sorted(groups.items(), key=order):
+            texts = []
+            for i, item in enumerate(group["items"]):
+                text = item["text"]
+                # PDF chunks start with "<section>. "; keep the heading only once per passage.
+                if i and section and text.startswith(f"{section}. "):
+                    text = text[len(section) + 2:]
+                texts.append(text)
+            passages.append(" ".join(texts))
+        return passages
+
+    def pack(self, items: List[Dict]) -> Dict:
+        """
+        Return the packed context for retrieval results (dicts with "text"
+        and optionally "chunkId", "source", "section" and "page"), together
+        with the chunks it includes and its estimated token counts.
+        """
+        with span("prompt_build"):
+            selected, duplicates, over_budget = self._select(items)
+            context = "\n".join(self._merge(selected))
+            original_tokens = estimate_tokens("\n".join(item["text"] for item in items))
+            tokens = estimate_tokens(context)
+        increment("prompt_tokens", tokens)
+        increment("prompt_tokens_saved", original_tokens - tokens)
+        return {
+            "context": context,
+            "items": selected,
+            "chunk_ids": [item.get("chunkId") for item in selected],
+            "tokens": tokens,
+            "original_tokens": original_tokens,
+            "tokens_saved": original_tokens - tokens,
+            "duplicates": duplicates,
+            "over_budget": over_budget,
+        }
@@ -0,0 +1,160 @@
+import numpy as np
+
+# Rows scored per step, which bounds the temporary float memory of a query.
+BLOCK_ROWS = 16384
+
+
+class ScalarQuantizer:
+    """Per-dimension 8-bit scalar quantization: one byte per dimension."""
+
+    kind = "int8"
+
+    def __init__(self):
+        self.low = None
+        self.scale = None
+        self.trained_size = 0
+
+    def fit(self, vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.trained_size = len(vectors)
+        self.low = vectors.min(axis=0)
+        self.scale = np.maximum(vectors.max(axis=0) - self.low, 1e-12) / 255.0
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint((np.asarray(vectors, dtype=np.float32) - self.low) / self.scale)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate dot products between `query` and every encoded vector."""
+        # q . (low + scale * code) = q . low + (q * scale) . code
+        offset = float(np.dot(query, self.low))
+        weights = (query * self.scale).astype(np.float32)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            block = codes[start:start + BLOCK_ROWS]
+            out[start:start + len(block)] = block.astype(np.float32) @ weights + offset
+        return out
+
+    def state(self) -> dict:
+        return {"kind": np.array(self.kind), "trained_size": np.array(self.trained_size),
+                "low": self.low, "scale": self.scale}
+
+    @classmethod
+    def from_state(cls, state) -> "ScalarQuantizer":
+        quantizer = cls()
+        quantizer.low = state["low"]
+        quantizer.scale = state["scale"]
+        quantizer.trained_size = int(state["trained_size"])
+        return quantizer
+
+    def nbytes(self) -> int:
+        return self.low.nbytes + self.scale.nbytes
+
+
+class ProductQuantizer:
+    """
+    Product quantization: each vector is split into `subspaces` parts and every
+    part is replaced by the index of its nearest of `centroids` k-means
+    centroids, so a 384-dim float32 vector shrinks to `subspaces` bytes.
+    """
+
+    kind = "pq"
+
+    def __init__(self, subspaces: int = 48, centroids: int = 256, iterations: int = 15, sample: int = 10000,
+                 seed: int = 0):
+        if centroids > 256:
+            raise ValueError("At most 256 centroids fit in a one-byte code.")
+        self.subspaces = subspaces
+        self.centroids = centroids
+        self.iterations = iterations
+        self.sample = sample
+        self.seed = seed
+        self.codebooks = None
+        self.trained_size = 0
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        count, dim = vectors.shape
+        if dim % self.subspaces:
+            raise ValueError(f"Dimension {dim} is not divisible into {self.subspaces} subspaces.")
+        return vectors.reshape(count, self.subspaces, dim // self.subspaces)
+
+    def fit(self, vectors: np.ndarray):
+        rng = np.random.default_rng(self.seed)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.trained_size = len(vectors)
+        if len(vectors) > self.sample:
+            vectors = vectors[rng.choice(len(vectors), self.sample, replace=False)]
+        parts = self._split(vectors)
+        k = min(self.centroids, len(vectors))
+        codebooks = []
+        for m in range(self.subspaces):
+            data = np.ascontiguousarray(parts[:, m, :])
+            centers = data[rng.choice(len(data), k, replace=False)].copy()
+            for _ in range(self.iterations):
+                assignment = self._nearest(data, centers)
+                sums = np.stack([np.bincount(assignment, weights=column, minlength=k) for column in data.T], axis=1)
+                counts = np.bincount(assignment, minlength=k)
+                filled = counts > 0
+                centers[filled] = sums[filled] / counts[filled, None]
+            codebooks.append(centers)
+        self.codebooks = np.stack(codebooks)
+        return self
+
+    @staticmethod
+    def _nearest(data: np.ndarray, centers: np.ndarray) -> np.ndarray:
+        # ||x||^2 is the same for every center, so it does not affect the argmin.
+        distances = (centers ** 2).sum(axis=1) - 2 * data @ centers.T
+        return distances.argmin(axis=1)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        parts = self._split(np.asarray(vectors, dtype=np.float32))
+        codes = np.empty((len(parts), self.subspaces), dtype=np.uint8)
+        for m in range(self.subspaces):
+            codes[:, m] = self._nearest(parts[:, m, :], self.codebooks[m])
+        return codes
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate dot products via per-subspace lookup tables (asymmetric distance)."""
+        query_parts = query.astype(np.float32).reshape(self.subspaces, -1)
+        table = np.einsum("md,mkd->mk", query_parts, self.codebooks)
+        subspace_index = np.arange(self.subspaces)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            block = codes[start:start + BLOCK_ROWS]
+            out[start:start + len(block)] = table[subspace_index, block].sum(axis=1)
+        return out
+
+    def state(self) -> dict:
+        return {"kind": np.array(self.kind), "trained_size": np.array(self.trained_size),
+                "codebooks": self.codebooks}
+
+    @classmethod
+    def from_state(cls, state) -> "ProductQuantizer":
+        codebooks = state["codebooks"]
+        quantizer = cls(subspaces=codebooks.shape[0], centroids=codebooks.shape[1])
+        quantizer.codebooks = codebooks
+        quantizer.trained_size = int(state["trained_size"])
+        return quantizer
+
+    def nbytes(self) -> int:
+        return self.codebooks.nbytes
+
+
+QUANTIZERS = {"int8": ScalarQuantizer, "pq": ProductQuantizer}
+
+
+def pq_subspaces(dim: int, preferred: int = 48) -> int:
+    """Largest subspace count up to `preferred` that divides `dim`."""
+    return next(count for count in range(min(preferred, dim), 0, -1) if dim % count == 0)
+
+
+def load_quantizer(path: str):
+    with np.load(path) as state:
+        state = dict(state)
+    return QUANTIZERS[str(state["kind"])].from_state(state)
+
+
+def save_quantizer(quantizer, path: str):
+    with open(path, "wb") as f:
+        np.savez(f, **quantizer.state())
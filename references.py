@@ -1,49 +1,203 @@
-# references.py
-import os
-import json
-
-class ReferenceManager:
-    def __init__(self, ref_file="references.json"):
-        self.ref_file = ref_file
-        self.references = self.load_references()
-
-    def load_references(self):
-        if os.path.exists(self.ref_file):
-            with open(self.ref_file, "r") as file:
-                return json.load(file)
-        return {}
-
-    def save_references(self, references_data):
-        with open(self.ref_file, "w") as file:
-            json.dump(references_data, file, indent=4)
-
-    def add_reference(self, chunk_id, reference_data):
-        if chunk_id not in self.references:
-            self.references[chunk_id] = []
-        
-        self.references[chunk_id].append(reference_data)
-        self.save_references()
-
-    def get_references(self, chunk_id):
-        return self.references.get(chunk_id, [])
-
-    def update_reference(self, chunk_id, old_reference, new_reference):
-        if chunk_id in self.references:
-            try:
-                index = self.references[chunk_id].index(old_reference)
-                self.references[chunk_id][index] = new_reference
-                self.save_references()
-            except ValueError:
-                print(f"Reference not found for chunk_id {chunk_id}")
-        else:
-            print(f"No references found for chunk_id {chunk_id}")
-
-    def delete_reference(self, chunk_id, reference_data):
-        if chunk_id in self.references:
-            try:
-                self.references[chunk_id].remove(reference_data)
-                self.save_references()
-            except ValueError:
-                print(f"Reference not found for chunk_id {chunk_id}")
-        else:
-            print(f"No references found for chunk_id {chunk_id}")
+# references.py
+import os
+import json
+import time
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+class ReferenceManager:
+    """
+    Reference store backed by an append-only log.
+
+    Every change is one JSON line appended to `log_file`; the file is flushed
+    to the OS after each line and fsynced at most every `fsync_every` records
+    or `fsync_interval` seconds. Once the log holds `compact_every` records it
+    is folded into the `ref_file` snapshot and truncated. Records carry a
+    sequence number and the snapshot stores the last one it includes, so
+    records left in the log by a crash during compaction are not applied
+    twice. References by chunk ID and citation counts by chunk, section and
+    page are kept in memory, so lookups never re-read the files.
+    """
+
+    def __init__(self, ref_file="references.json", log_file=None, fsync_every=20, fsync_interval=5.0,
+                 compact_every=1000):
+        self.ref_file = ref_file
+        self.log_file = log_file or os.path.splitext(ref_file)[0] + ".log"
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+        self.references = {}
+        self.chunk_citations = Counter()
+        self.section_citations = Counter()
+        self.page_citations = Counter()
+        self.chunks_by_section = {}
+        self.chunks_by_page = {}
+        self.last_references = None
+        self.seq = 0
+        self.load_references()
+        self._log = open(self.log_file, "a", encoding="utf-8")
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def load_references(self):
+        if os.path.exists(self.ref_file):
+            with open(self.ref_file, "r") as file:
+                snapshot = json.load(file)
+            self._load_snapshot(snapshot)
+        self._log_records = 0
+        if os.path.exists(self.log_file):
+            with open(self.log_file, "r", encoding="utf-8") as file:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-write.
+                        continue
+                    if record.get("seq", self.seq + 1) <= self.seq:
+                        # Already folded into the snapshot.
+                        continue
+                    self.seq = record.get("seq", self.seq)
+                    self._apply(record)
+                    self._log_records += 1
+        return self.references
+
+    def _load_snapshot(self, snapshot):
+        if "references" in snapshot or "citations" in snapshot:
+            self.references = snapshot.get("references", {})
+            citations = snapshot.get("citations", {})
+            self.chunk_citations = Counter(citations.get("chunks", {}))
+            self.section_citations = Counter(citations.get("sections", {}))
+            self.page_citations = Counter(citations.get("pages", {}))
+            self.chunks_by_section = {key: set(ids) for key, ids in snapshot.get("chunks_by_section", {}).items()}
+            self.chunks_by_page = {key: set(ids) for key, ids in snapshot.get("chunks_by_page", {}).items()}
+            self.last_references = snapshot.get("last")
+            self.seq = snapshot.get("seq", 0)
+        elif isinstance(snapshot.get("sections"), list) or isinstance(snapshot.get("pages"), list):
+            # Older files held only the references of the last answer.
+            self._cite(snapshot)
+        else:
+            # Older files written by add_reference: {chunk_id: [reference, ...]}.
+            self.references = snapshot
+
+    def _cite(self, references_data, chunk_ids=()):
+        sections = references_data.get("sections", [])
+        pages = [str(page) for page in references_data.get("pages", [])]
+        self.section_citations.update(sections)
+        self.page_citations.update(pages)
+        self.chunk_citations.update(str(chunk_id) for chunk_id in chunk_ids)
+        for section in sections:
+            self.chunks_by_section.setdefault(section, set()).update(map(str, chunk_ids))
+        for page in pages:
+            self.chunks_by_page.setdefault(page, set()).update(map(str, chunk_ids))
+        self.last_references = {"sections": sections, "pages": pages}
+
+    def _apply(self, record):
+        op = record["op"]
+        if op == "cite":
+            self._cite(record["references"], record.get("chunk_ids", []))
+        elif op == "add":
+            self.references.setdefault(record["chunk_id"], []).append(record["reference"])
+        elif op == "update":
+            refs = self.references.get(record["chunk_id"], [])
+            refs[refs.index(record["old"])] = record["new"]
+        elif op == "delete":
+            self.references.get(record["chunk_id"], []).remove(record["reference"])
+
+    def _append(self, record):
+        self.seq += 1
+        record["seq"] = self.seq
+        self._apply(record)
+        self._log.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._log.flush()
+        self._log_records += 1
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self._sync()
+        if self._log_records >= self.compact_every:
+            self.compact()
+
+    def _sync(self):
+        if self._unsynced:
+            os.fsync(self._log.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def compact(self):
+        """Write the current state to the snapshot and start an empty log."""
+        snapshot = {
+            "references": self.references,
+            "citations": {
+                "chunks": dict(self.chunk_citations),
+                "sections": dict(self.section_citations),
+                "pages": dict(self.page_citations),
+            },
+            "chunks_by_section": {key: sorted(ids) for key, ids in self.chunks_by_section.items()},
+            "chunks_by_page": {key: sorted(ids) for key, ids in self.chunks_by_page.items()},
+            "last": self.last_references,
+            "seq": self.seq,
+        }
+        tmp_file = self.ref_file + ".tmp"
+        with open(tmp_file, "w") as file:
+            json.dump(snapshot, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_file, self.ref_file)
+        self._log.truncate(0)
+        self._log.seek(0)
+        self._log_records = 0
+        self._unsynced = 0
+
+    def close(self):
+        self._sync()
+        self._log.close()
+
+    def save_references(self, references_data, chunk_ids=None):
+        """Record the sections and pages cited by one answer, with the chunk IDs they came from."""
+        self._append({"op": "cite", "time": time.time(), "references": references_data,
+                      "chunk_ids": [str(chunk_id) for chunk_id in chunk_ids or []]})
+
+    def add_reference(self, chunk_id, reference_data):
+        self._append({"op": "add", "chunk_id": str(chunk_id), "reference": reference_data})
+
+    def get_references(self, chunk_id):
+        return self.references.get(str(chunk_id), [])
+
+    def update_reference(self, chunk_id, old_reference, new_reference):
+        chunk_id = str(chunk_id)
+        if chunk_id in self.references:
+            if old_reference in self.references[chunk_id]:
+                self._append({"op": "update", "chunk_id": chunk_id, "old": old_reference, "new": new_reference})
+            else:
+                logger.warning("Reference not found for chunk_id %s", chunk_id)
+        else:
+            logger.warning("No references found for chunk_id %s", chunk_id)
+
+    def delete_reference(self, chunk_id, reference_data):
+        chunk_id = str(chunk_id)
+        if chunk_id in self.references:
+            if reference_data in self.references[chunk_id]:
+                self._append({"op": "delete", "chunk_id": chunk_id, "reference": reference_data})
+            else:
+                logger.warning("Reference not found for chunk_id %s", chunk_id)
+        else:
+            logger.warning("No references found for chunk_id %s", chunk_id)
+
+    def most_cited_pages(self, n=10):
+        return self.page_citations.most_common(n)
+
+    def most_cited_sections(self, n=10):
+        return self.section_citations.most_common(n)
+
+    def most_cited_chunks(self, n=10):
+        return self.chunk_citations.most_common(n)
+
+    def chunks_for_section(self, section):
+        return sorted(self.chunks_by_section.get(section, ()))
+
+    def chunks_for_page(self, page):
+        return sorted(self.chunks_by_page.get(str(page), ()))
@@ -0,0 +1,47 @@
+import os
+import re
+import sys
+import zlib
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeEmbedder:
+    """
+    Unit-length hashed character-trigram vectors, like the normalized output
+    of the real model: texts that share words land close together, and a
+    small change to a query moves its vector only a little.
+    """
+
+    model_name = "fake"
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.calls = []
+
+    def encode(self, texts, use_cache=True):
+        self.calls.append((list(texts), use_cache))
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                word = f" {word.strip('.,?!')} "
+                for j in range(len(word) - 2):
+                    vectors[i, zlib.crc32(word[j:j + 3].encode()) % self.dim] += 1
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def split_sentences(text):
+    return [sentence.strip() for sentence in re.findall(r"[^.]+\.?", text) if sentence.strip()]
+
+
+def split_words(text):
+    return re.findall(r"\w+|[^\w\s]", text)
+
+
+@pytest.fixture
+def simple_tokenizers(monkeypatch):
+    """Replace the nltk tokenizers, so tests do not depend on the punkt data being downloaded."""
+    monkeypatch.setattr("nltk.tokenize.sent_tokenize", split_sentences)
+    monkeypatch.setattr("nltk.tokenize.word_tokenize", split_words)
@@ -0,0 +1,68 @@
+import json
+from answerCache import AnswerCache
+from batchQuery import OfflineClient
+from RAG import RAG
+from conftest import FakeEmbedder
+
+
+def test_exact_and_semantic_hits():
+    cache = AnswerCache(semantic_threshold=0.1, embedder=FakeEmbedder())
+    cache.put("m", "Who invented the steam engine?", ["1", "2"], "Newcomen")
+    assert cache.get("m", "who invented the steam engine", ["2", "1"]) == "Newcomen"
+    assert cache.get("m", "Who invented the steam engines?", ["1", "2"]) == "Newcomen"
+    assert cache.get("m", "Who invented the steam engine?", ["3"]) is None
+    assert cache.get("m", "When did the railway open?", ["1", "2"]) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["semantic_hits"] == 1
+
+
+def test_eviction_frees_vector_rows():
+    cache = AnswerCache(max_entries=2, semantic_threshold=0.1, embedder=FakeEmbedder())
+    for i, query in enumerate(["alpha", "beta", "gamma", "delta"]):
+        cache.put("m", query, [str(i)], query.upper())
+    assert list(cache.get("m", q, [str(i)]) for i, q in enumerate(["alpha", "beta", "gamma", "delta"])) == \
+        [None, None, "GAMMA", "DELTA"]
+    assert len(cache._rows) == 2
+
+
+def test_answers_survive_a_restart_through_the_log(tmp_path):
+    path = str(tmp_path / "answers.json")
+    cache = AnswerCache(path, max_entries=10, semantic_threshold=0.1, embedder=FakeEmbedder())
+    cache.put("m", "what was the first question", ["1"], "one")
+    cache.put("m", "what was the second question", ["2"], "two")
+    # Nothing is rewritten per answer; the log holds one line each.
+    assert not (tmp_path / "answers.json").exists()
+    assert len((tmp_path / "answers.json.log").read_text().splitlines()) == 2
+
+    reopened = AnswerCache(path, max_entries=10, semantic_threshold=0.1, embedder=FakeEmbedder())
+    assert reopened.get("m", "what was the first question", ["1"]) == "one"
+    assert reopened.get("m", "what was the second questions", ["2"]) == "two"
+
+
+def test_log_is_folded_into_the_snapshot(tmp_path):
+    path = str(tmp_path / "answers.json")
+    cache = AnswerCache(path, max_entries=3)
+    for i in range(4):
+        cache.put("m", f"question {i}", [str(i)], f"answer {i}")
+    with open(path) as f:
+        assert len(json.load(f)) == 3
+    assert len((tmp_path / "answers.json.log").read_text().splitlines()) == 1
+    cache.close()
+    assert AnswerCache(path, max_entries=3).get("m", "question 3", ["3"]) == "answer 3"
+
+
+def test_legacy_snapshot_is_read(tmp_path):
+    path = tmp_path / "answers.json"
+    cache = AnswerCache()
+    entry = {"context": cache.context_key("m", ["1"]), "query": "q", "answer": "a", "created": 1e12,
+             "embedding": None}
+    path.write_text(json.dumps([[cache.key("m", "q", ["1"]), entry]]))
+    assert AnswerCache(str(path)).get("m", "q", ["1"]) == "a"
+
+
+def test_rag_answers_from_the_cache_with_the_offline_client():
+    rag = RAG(api_key=None, client=OfflineClient(), cache=AnswerCache())
+    first = rag.query_gemini("The engine pumped water. It was slow.", "question", chunk_ids=["1"])
+    assert first == "The engine pumped water"
+    assert rag.query_gemini("The engine pumped water. It was slow.", "question", chunk_ids=["1"]) == first
+    assert rag.query_gemini("Railways came later.", "question", chunk_ids=["2"]) == "Railways came later."
+    assert rag.cache.stats()["hits"] == 1 and rag.cache.stats()["misses"] == 2
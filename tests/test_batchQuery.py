@@ -0,0 +1,73 @@
+import json
+from batchQuery import OfflineClient, load_queries, run_batch, collect_references
+from promptBuilder import PromptBuilder
+from vectorStorage import VectorStore
+from RAG import RAG
+from conftest import FakeEmbedder
+
+CHUNKS = [
+    ("Coal Industry. Newcomen built a steam engine to pump water from coal mines.", 5, "Coal Industry"),
+    ("Coal Industry. Humphry Davy produced the safety lamp in 1812.", 6, "Coal Industry"),
+    ("Transport. The railway from Colombo to Kandy was started in 1858.", 12, "Transport"),
+    ("Plantations. Tea, coconut and rubber were cultivated on a large scale.", 14, "Plantations"),
+]
+
+
+def make_store(tmp_path):
+    store = VectorStore(str(tmp_path / "db"), embedder=FakeEmbedder(), backend="numpy")
+    store.insert([text for text, _, _ in CHUNKS],
+                 [{"chunkId": str(i), "page": page, "section": section, "source": "book.pdf", "source_type": "pdf"}
+                  for i, (_, page, section) in enumerate(CHUNKS)])
+    return store
+
+
+def test_search_batch_matches_single_searches(tmp_path):
+    store = make_store(tmp_path)
+    queries = ["Who built the steam engine for coal mines?", "When was the railway to Kandy started?"]
+    for mode in ("dense", "hybrid"):
+        batched = store.search_batch(queries, top_k=2, mode=mode)
+        single = [store.search(query, top_k=2, mode=mode) for query in queries]
+        assert [[item["chunkId"] for item in items] for items in batched] == \
+            [[item["chunkId"] for item in items] for items in single]
+
+
+def test_run_batch_writes_answers_in_order(tmp_path):
+    store = make_store(tmp_path)
+    queries_path = tmp_path / "queries.json"
+    queries_path.write_text(json.dumps([
+        {"query_id": "5", "question": "Who built the steam engine for coal mines?"},
+        {"question": "When was the railway to Kandy started?"},
+    ]))
+    queries = load_queries(str(queries_path))
+    assert [item["query_id"] for item in queries] == ["5", "1"]
+
+    output = tmp_path / "answers.jsonl"
+    rag = RAG(api_key=None, client=OfflineClient())
+    summary = run_batch(queries, store, rag, PromptBuilder(), str(output), top_k=1, similarity_threshold=4.0,
+                        concurrency=2)
+
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert summary["queries"] == 2 and summary["failed"] == 0
+    assert [record["query_id"] for record in records] == ["5", "1"]
+    assert records[0]["references"] == {"sections": ["Coal Industry"], "pages": ["5"]}
+    assert records[0]["answer"].startswith("Coal Industry")
+    assert records[1]["references"] == {"sections": ["Transport"], "pages": ["12"]}
+
+
+def test_queries_file_may_be_jsonl(tmp_path):
+    path = tmp_path / "queries.jsonl"
+    path.write_text('{"question": "a"}\n\n{"question": "b", "query_id": 7}\n')
+    assert load_queries(str(path)) == [{"question": "a", "query_id": "0"}, {"question": "b", "query_id": "7"}]
+
+
+def test_offline_client_streams_the_same_answer():
+    rag = RAG(api_key=None, client=OfflineClient())
+    context = "The railway was started in 1858. Roads came first."
+    pieces = list(rag.stream_answer(context, "When did the railway start?"))
+    assert len(pieces) > 1
+    assert "".join(pieces).strip() == rag.query_gemini(context, "When did the railway start?")
+
+
+def test_references_skip_missing_sections_and_pages():
+    items = [{"section": "Transport", "page": 12}, {"section": None, "page": None, "source": "https://x"}]
+    assert collect_references(items) == {"sections": ["Transport"], "pages": ["12"]}
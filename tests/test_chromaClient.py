@@ -0,0 +1,56 @@
+import logging
+import pytest
+import chromaClient
+from dbManagement import DBManager
+from vectorStorage import VectorStore
+from conftest import FakeEmbedder
+
+pytest.importorskip("chromadb")
+
+
+def forget_handles():
+    """Drop the shared handles, as a new process would start without them."""
+    chromaClient._collections.clear()
+
+
+def test_texts_are_embedded_with_the_embedder(tmp_path):
+    embedder = FakeEmbedder()
+    manager = DBManager(str(tmp_path), embedder=embedder)
+    manager.insert_data({"chunks": ["The railway to Kandy opened.", "Tea was planted in the hills."],
+                         "metadata": [{"chunkId": "1", "page": 3}, {"chunkId": "2", "page": 4}]})
+    assert manager.retrieve_data("railway to Kandy", n_results=1)[0]["chunkId"] == "1"
+    # Documents may be served from the embedding cache; queries never are.
+    assert embedder.calls[0] == (["The railway to Kandy opened.", "Tea was planted in the hills."], True)
+    assert embedder.calls[1] == (["railway to Kandy"], False)
+
+    forget_handles()
+    reopened = DBManager(str(tmp_path), embedder=FakeEmbedder())
+    assert reopened.update_data("2", "Rubber was planted in the hills.")
+    assert reopened.retrieve_data("rubber planted", n_results=1)[0]["chunkId"] == "2"
+
+
+def test_collection_created_with_the_default_function_reopens(tmp_path, caplog):
+    # A store written before the embedder was attached to the collection.
+    embedder = FakeEmbedder()
+    chromaClient.get_client(str(tmp_path)).get_or_create_collection("history_chunks").add(
+        ids=["1"], documents=["Newcomen built a steam engine."],
+        embeddings=embedder.encode(["Newcomen built a steam engine."]).tolist(),
+        metadatas=[{"chunkId": "1", "page": 5}])
+
+    with caplog.at_level(logging.WARNING, logger="chromaClient"):
+        store = VectorStore(str(tmp_path), embedder=embedder)
+        assert store.ids() == ["1"]
+    assert "keeps the embedding function" in caplog.text
+    assert store.search("steam engine", top_k=1)[0]["page"] == 5
+
+    store.reset()
+    forget_handles()
+    assert VectorStore(str(tmp_path), embedder=embedder).collection.count() == 0
+
+
+def test_handle_open_with_another_model_is_refused(tmp_path):
+    chromaClient.get_collection(str(tmp_path), "documents", FakeEmbedder())
+    other = FakeEmbedder()
+    other.model_name = "other"
+    with pytest.raises(ValueError):
+        chromaClient.get_collection(str(tmp_path), "documents", other)
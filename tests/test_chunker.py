@@ -0,0 +1,84 @@
+import random
+import pytest
+from chunker import StreamingChunker
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def retokenizing_chunks(sentences, chunk_size):
+    """The loop StreamingChunker replaced: re-count the whole candidate chunk for every sentence."""
+    chunks = []
+    current_chunk = ""
+    for sentence in sentences:
+        if count_words(current_chunk + " " + sentence) <= chunk_size:
+            current_chunk += " " + sentence
+        else:
+            if current_chunk.strip():
+                chunks.append(current_chunk.strip())
+            current_chunk = sentence.strip()
+    if current_chunk.strip():
+        chunks.append(current_chunk.strip())
+    return chunks
+
+
+def sentences(*lengths):
+    return [" ".join(f"w{i}_{j}" for j in range(length)) + "." for i, length in enumerate(lengths)]
+
+
+@pytest.mark.parametrize("chunk_size", [5, 20, 100])
+def test_matches_the_retokenizing_loop(chunk_size):
+    rng = random.Random(chunk_size)
+    # Lengths up to 30 include sentences longer than a whole chunk.
+    text = sentences(*(rng.randint(1, 30) for _ in range(500)))
+    chunker = StreamingChunker(chunk_size, token_counter=count_words)
+    assert list(chunker.chunk(text)) == retokenizing_chunks(text, chunk_size)
+
+
+def test_overlap_carries_trailing_sentences():
+    s = sentences(3, 3, 3, 3, 3)
+    chunker = StreamingChunker(10, overlap=4, token_counter=count_words)
+    assert list(chunker.chunk(s)) == [" ".join(s[0:3]), " ".join(s[2:5])]
+    # A stride is the same as an overlap of chunk_size - stride.
+    assert list(StreamingChunker(10, stride=6, token_counter=count_words).chunk(s)) == list(chunker.chunk(s))
+
+
+def test_overlap_never_crowds_out_the_next_sentence():
+    s = sentences(3, 3, 3, 8)
+    chunker = StreamingChunker(10, overlap=4, token_counter=count_words)
+    # Carrying the 3-token sentence would leave no room for the 8-token one.
+    assert list(chunker.chunk(s)) == [" ".join(s[0:3]), s[3]]
+
+
+def test_oversized_sentences_are_kept_or_dropped():
+    s = sentences(12, 2, 12, 2)
+    kept = StreamingChunker(10, token_counter=count_words)
+    assert list(kept.chunk(s)) == s
+    # Like the original PDF loop, only a sentence that arrives at an empty
+    # chunk is dropped; one that ends a chunk starts the next one.
+    dropped = StreamingChunker(10, token_counter=count_words, keep_oversized=False)
+    assert list(dropped.chunk(s)) == s[1:]
+
+
+def test_limit_overrides_the_chunk_size_per_sentence():
+    s = sentences(3, 3, 3)
+    chunker = StreamingChunker(10, token_counter=count_words)
+    assert chunker.add(s[0], limit=5) is None
+    assert chunker.add(s[1], limit=5) == s[0]
+    assert chunker.add(s[2]) is None
+    assert len(chunker) == 6
+    assert chunker.flush() == " ".join(s[1:3])
+    assert chunker.flush() is None
+
+
+def test_precounted_tokens_are_used_as_given():
+    chunker = StreamingChunker(10, token_counter=lambda text: pytest.fail("counted again"))
+    assert chunker.add("a b c.", token_count=3) is None
+    assert len(chunker) == 3
+
+
+@pytest.mark.parametrize("options", [{"overlap": 10}, {"overlap": -1}, {"stride": 0}, {"stride": 11}])
+def test_invalid_overlap_or_stride_is_refused(options):
+    with pytest.raises(ValueError):
+        StreamingChunker(10, **options)
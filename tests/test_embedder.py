@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+import embedder as embedder_module
+from embedder import Embedder
+from conftest import FakeEmbedder
+
+
+class CountingModel:
+    """Stands in for a SentenceTransformer and records every batch it encodes."""
+
+    def __init__(self, scale=1.0):
+        self.scale = scale
+        self.batches = []
+        self.vectors = FakeEmbedder(dim=8)
+
+    def encode(self, batch, batch_size, convert_to_numpy, show_progress_bar):
+        self.batches.append(list(batch))
+        return self.vectors.encode(batch) * self.scale
+
+    def get_sentence_embedding_dimension(self):
+        return 8
+
+
+@pytest.fixture
+def models(monkeypatch):
+    models = {"model-a": CountingModel(), "model-b": CountingModel(scale=2.0)}
+    monkeypatch.setattr(embedder_module, "_models", dict(models))
+    return models
+
+
+def test_cache_hits_skip_the_model(models, tmp_path):
+    cache_path = str(tmp_path / "cache.sqlite")
+    first = Embedder("model-a", cache_path=cache_path).encode(["steam engine", "safety lamp", "steam engine"])
+    assert models["model-a"].batches == [["safety lamp", "steam engine"]]
+
+    # A new Embedder on the same file, as after a restart, only computes the new text.
+    again = Embedder("model-a", cache_path=cache_path).encode(["railway", "steam engine"])
+    assert models["model-a"].batches[1:] == [["railway"]]
+    assert np.array_equal(again[1], first[0])
+
+
+def test_cache_is_keyed_by_model(models, tmp_path):
+    cache_path = str(tmp_path / "cache.sqlite")
+    a = Embedder("model-a", cache_path=cache_path).encode(["steam engine"])
+    b = Embedder("model-b", cache_path=cache_path).encode(["steam engine"])
+    assert models["model-b"].batches == [["steam engine"]]
+    assert np.allclose(b, 2 * a)
+
+
+def test_queries_can_bypass_the_cache(models, tmp_path):
+    embedder = Embedder("model-a", cache_path=str(tmp_path / "cache.sqlite"))
+    embedder.encode(["steam engine"], use_cache=False)
+    embedder.encode(["steam engine"], use_cache=False)
+    assert models["model-a"].batches == [["steam engine"], ["steam engine"]]
+    embedder.encode(["steam engine"])
+    embedder.encode(["steam engine"])
+    assert len(models["model-a"].batches) == 3
+
+
+def test_batches_are_sorted_by_length_and_bounded(models):
+    embedder = Embedder("model-a", batch_size=2, normalize=True, dtype="float16")
+    texts = ["a much longer sentence here", "short", "mid length text", "tiny"]
+    vectors = embedder.encode(texts)
+    assert models["model-a"].batches == [["tiny", "short"], ["mid length text", "a much longer sentence here"]]
+    assert vectors.dtype == np.float16 and vectors.shape == (4, 8)
+    assert np.allclose(np.linalg.norm(vectors.astype(np.float32), axis=1), 1.0, atol=1e-3)
+    assert embedder.encode([]).shape == (0, 8)
@@ -0,0 +1,151 @@
+import os
+import time
+import threading
+import http.server
+import pytest
+from fetcher import Fetcher
+from fetchCache import FetchCache
+from preprocessor import extract_article_text
+
+
+def crash_parse(body, url):
+    os._exit(1)
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/missing" or (self.path == "/flaky" and server.flaky_status == 404):
+            return self._send(404, b"")
+        if self.path == "/flaky" and server.flaky_status != 200:
+            return self._send(server.flaky_status, b"")
+        etag = f'"{self.path}"'
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, b"")
+        if self.path.startswith("/page/"):
+            # Later pages answer first, so out-of-order completion is exercised.
+            time.sleep(0.05 * (5 - int(self.path.rsplit("/", 1)[1])))
+        body = f"<html><body><article>Text of {self.path}.</article></body></html>".encode()
+        self._send(200, body, etag)
+
+    def _send(self, status, body, etag=None):
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.requests = []
+    server.flaky_status = 200
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_iter_fetch_keeps_input_order(server):
+    fetcher = Fetcher(max_workers=5, per_host=5, parse_workers=2, retries=0)
+    urls = [f"{server.url}/page/{i}" for i in range(5)] + [f"{server.url}/missing"]
+    results = list(fetcher.iter_fetch(urls, parse=extract_article_text))
+    assert [url for url, _ in results] == urls
+    assert [text for _, text in results] == [f"Text of /page/{i}." for i in range(5)] + [None]
+
+
+def test_broken_parse_pool_yields_none_instead_of_hanging(server):
+    fetcher = Fetcher(max_workers=4, per_host=4, parse_workers=1, retries=0)
+    urls = [f"{server.url}/page/{i}" for i in range(4)]
+    assert list(fetcher.iter_fetch(urls, parse=crash_parse)) == [(url, None) for url in urls]
+
+
+def test_missing_page_gives_none(server):
+    assert Fetcher(parse_workers=0, retries=0).fetch(f"{server.url}/missing") is None
+
+
+def test_cached_page_is_revalidated_with_its_etag(server, tmp_path):
+    fetcher = Fetcher(parse_workers=0, retries=0)
+    cache = FetchCache(str(tmp_path))
+    url = f"{server.url}/page/4"
+    body, changed = cache.fetch(url, fetcher)
+    assert changed and b"Text of /page/4." in body
+
+    assert cache.fetch(url, fetcher) == (body, False)
+    assert server.requests[-1] == ("/page/4", '"/page/4"')
+    # The validators survive a restart.
+    assert FetchCache(str(tmp_path)).fetch(url, fetcher) == (body, False)
+
+
+def test_cached_copy_is_served_when_revalidation_fails(server, tmp_path):
+    fetcher = Fetcher(parse_workers=0, retries=0)
+    cache = FetchCache(str(tmp_path))
+    url = f"{server.url}/flaky"
+    body, _ = cache.fetch(url, fetcher)
+
+    server.flaky_status = 503
+    assert cache.fetch(url, fetcher) == (body, False)
+    server.flaky_status = 404
+    assert cache.fetch(url, fetcher) == (None, False)
+
+    server.flaky_status = 200
+    cache.fetch(url, fetcher)
+    server.shutdown()
+    server.server_close()
+    assert cache.fetch(url, fetcher) == (body, False)
+
+
+def test_offline_serves_only_cached_pages(server, tmp_path):
+    fetcher = Fetcher(parse_workers=0, retries=0)
+    url = f"{server.url}/page/3"
+    FetchCache(str(tmp_path)).fetch(url, fetcher)
+    requests_before = len(server.requests)
+
+    offline = FetchCache(str(tmp_path), offline=True)
+    body, changed = offline.fetch(url, fetcher)
+    assert b"Text of /page/3." in body and not changed
+    assert offline.fetch(f"{server.url}/page/2", fetcher) == (None, False)
+    assert len(server.requests) == requests_before
+
+
+def test_least_recently_used_pages_are_evicted(server, tmp_path):
+    fetcher = Fetcher(parse_workers=0, retries=0)
+    page_size = len(FetchCache(str(tmp_path / "probe")).fetch(f"{server.url}/page/4", fetcher)[0])
+    cache = FetchCache(str(tmp_path / "cache"), max_bytes=3 * page_size + 40)
+    for i in (1, 2, 3):
+        cache.fetch(f"{server.url}/page/{i}", fetcher)
+    cache.put_text(FetchCache.url_key(f"{server.url}/page/1"), "Page one.")
+    # Page 1 was used last, so page 2 is the oldest once page 4 arrives.
+    cache.fetch(f"{server.url}/page/4", fetcher)
+    cached = {i for i in (1, 2, 3, 4) if FetchCache.url_key(f"{server.url}/page/{i}") in cache.entries}
+    assert cached == {1, 3, 4}
+    assert cache.total_bytes == sum(entry["size"] for entry in cache.entries.values()) <= cache.max_bytes
+    assert not (tmp_path / "cache" / (FetchCache.url_key(f"{server.url}/page/2") + ".body")).exists()
+    assert cache.get_text(FetchCache.url_key(f"{server.url}/page/1")) == "Page one."
+
+
+def test_index_is_appended_and_replayed(server, tmp_path):
+    fetcher = Fetcher(parse_workers=0, retries=0)
+    cache = FetchCache(str(tmp_path))
+    for i in range(3):
+        cache.fetch(f"{server.url}/page/{i}", fetcher)
+    # Nothing rewrote the snapshot; every fetch is one log line.
+    assert not (tmp_path / "index.json").exists()
+    assert len((tmp_path / "index.log").read_text().splitlines()) == 3
+
+    # Reopened without close(), as after a crash, the log alone restores the index.
+    reopened = FetchCache(str(tmp_path), offline=True)
+    assert reopened.entries == cache.entries
+    reopened.close()
+    assert (tmp_path / "index.log").read_text() == ""
+    assert len(FetchCache(str(tmp_path)).entries) == 3
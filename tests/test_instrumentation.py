@@ -0,0 +1,22 @@
+import logging
+import pytest
+from instrumentation import configure_logging, project_loggers
+
+
+@pytest.fixture
+def restore_levels():
+    names = project_loggers() + ["httpx", ""]
+    levels = {name: logging.getLogger(name).level for name in names}
+    yield
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+
+
+def test_log_level_applies_to_project_modules_only(restore_levels, monkeypatch):
+    monkeypatch.setenv("RAG_LOG_LEVEL", "debug")
+    configure_logging()
+    assert {"__main__", "fetcher", "vectorStorage", "populate"} <= set(project_loggers())
+    assert logging.getLogger("fetcher").getEffectiveLevel() == logging.DEBUG
+    assert logging.getLogger("__main__").getEffectiveLevel() == logging.DEBUG
+    assert logging.getLogger("httpx").getEffectiveLevel() >= logging.WARNING
+    assert logging.getLogger("sentence_transformers.SentenceTransformer").getEffectiveLevel() >= logging.WARNING
@@ -0,0 +1,68 @@
+import math
+import pytest
+from lexicalIndex import LexicalIndex, tokenize
+
+DOCS = {
+    "1": "Newcomen built the steam engine to pump water.",
+    "2": "The steam engine of Watt was more efficient than the steam engine of Newcomen.",
+    "3": "Tea estates in the hills.",
+}
+
+
+def bm25(query, doc_id, docs, k1=1.5, b=0.75):
+    """Textbook BM25 over tokenized `docs`, to check the index against."""
+    tokens = {chunk_id: tokenize(text) for chunk_id, text in docs.items()}
+    average_length = sum(map(len, tokens.values())) / len(tokens)
+    score = 0.0
+    for term in set(tokenize(query)):
+        containing = sum(term in doc for doc in tokens.values())
+        if not containing:
+            continue
+        idf = math.log(1 + (len(tokens) - containing + 0.5) / (containing + 0.5))
+        frequency = tokens[doc_id].count(term)
+        norm = k1 * (1 - b + b * len(tokens[doc_id]) / average_length)
+        score += idf * frequency * (k1 + 1) / (frequency + norm)
+    return score
+
+
+def make_index(path=None, docs=DOCS):
+    index = LexicalIndex(path)
+    index.add(list(docs), list(docs.values()))
+    return index
+
+
+def test_scores_match_bm25():
+    results = make_index().search("the Newcomen steam engine", top_k=3)
+    assert [chunk_id for chunk_id, _ in results] == ["2", "1"]
+    for chunk_id, score in results:
+        assert score == pytest.approx(bm25("the Newcomen steam engine", chunk_id, DOCS))
+
+
+def test_stopwords_and_unknown_terms_match_nothing():
+    assert make_index().search("the of was zeppelin") == []
+    assert LexicalIndex().search("steam") == []
+
+
+def test_allowed_restricts_the_results():
+    assert make_index().search("steam engine Newcomen", allowed={"1", "3"}) == \
+        [("1", pytest.approx(bm25("steam engine Newcomen", "1", DOCS)))]
+
+
+def test_remove_and_replace_update_the_statistics():
+    index = make_index()
+    index.remove(["2", "missing"])
+    remaining = {key: DOCS[key] for key in ("1", "3")}
+    assert index.search("steam") == [("1", pytest.approx(bm25("steam", "1", remaining)))]
+    assert index.total_length == sum(len(tokenize(text)) for text in remaining.values())
+
+    index.add(["1"], ["Railways reached Kandy."])
+    assert index.search("steam") == []
+    assert [chunk_id for chunk_id, _ in index.search("Kandy")] == ["1"]
+    assert len(index) == 2
+
+
+def test_saved_index_loads_with_the_same_scores(tmp_path):
+    path = str(tmp_path / "lexical_index.json")
+    index = make_index(path)
+    index.save()
+    assert LexicalIndex(path).search("steam engine hills", top_k=3) == index.search("steam engine hills", top_k=3)
@@ -0,0 +1,61 @@
+import numpy as np
+import numpyStore
+from numpyStore import NumpyCollection
+
+
+def unit_rows(count, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def add_rows(collection, vectors, start=0):
+    ids = [str(i) for i in range(start, start + len(vectors))]
+    collection.add(ids=ids, documents=[f"doc {i}" for i in ids], embeddings=vectors,
+                   metadatas=[{"n": int(i)} for i in ids])
+    return ids
+
+
+def test_query_matches_brute_force_across_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(numpyStore, "BLOCK_ROWS", 7)
+    vectors = unit_rows(50)
+    collection = NumpyCollection(str(tmp_path))
+    add_rows(collection, vectors)
+    collection.delete(ids=["3", "17"])
+
+    queries = unit_rows(4, seed=1)
+    results = collection.query(queries, n_results=5)
+    scores = queries @ vectors.T
+    scores[:, [3, 17]] = -np.inf
+    expected = np.argsort(-scores, axis=1)[:, :5]
+    assert results["ids"] == [[str(i) for i in row] for row in expected]
+    assert np.allclose(results["distances"], 2 - 2 * np.take_along_axis(scores, expected, axis=1), atol=1e-5)
+
+
+def test_writes_survive_reopen_without_duplicates(tmp_path):
+    vectors = unit_rows(20)
+    collection = NumpyCollection(str(tmp_path))
+    add_rows(collection, vectors[:10])
+    add_rows(collection, vectors[10:], start=10)
+    collection.upsert(ids=["4"], documents=["changed"], embeddings=vectors[5:6], metadatas=[{"n": 40}])
+    collection.delete(ids=["7"])
+
+    reopened = NumpyCollection(str(tmp_path))
+    assert reopened.count() == 19
+    assert reopened.get(ids=["4"]) == {"ids": ["4"], "documents": ["changed"], "metadatas": [{"n": 40}]}
+    assert reopened.get(ids=["7"])["ids"] == []
+    assert sorted(reopened.query(vectors[5], n_results=2)["ids"][0]) == ["4", "5"]
+
+
+def test_dead_rows_are_compacted(tmp_path, monkeypatch):
+    monkeypatch.setattr(numpyStore, "MIN_CAPACITY", 4)
+    vectors = unit_rows(12)
+    collection = NumpyCollection(str(tmp_path))
+    ids = add_rows(collection, vectors)
+    generation = collection.generation
+    collection.delete(ids=ids[:9])
+    assert collection.generation > generation
+    assert not collection.dead
+
+    reopened = NumpyCollection(str(tmp_path))
+    assert sorted(reopened.get()["ids"], key=int) == ids[9:]
+    assert reopened.query(vectors[10], n_results=1)["ids"] == [["10"]]
@@ -0,0 +1,70 @@
+import pytest
+from preprocessor import Preprocessor
+
+PAGES = {
+    "https://example.org/coal": "Newcomen built a steam engine. Davy made a safety lamp. Newcomen built a steam engine.",
+    "https://example.org/rail": "The railway to Kandy was started in 1858.",
+}
+
+
+class PageFetcher:
+    """Serves fixed page texts through the Fetcher.iter_fetch interface."""
+
+    def iter_fetch(self, urls, parse=None, fetch=None):
+        for url in urls:
+            yield url, PAGES.get(url)
+
+
+@pytest.fixture(autouse=True)
+def tokenizers(simple_tokenizers):
+    pass
+
+
+def make_pdf(path, page_count):
+    """A PDF whose pages carry printed page numbers, headings and body lines of varying length."""
+    import fitz
+
+    doc = fitz.open()
+    for i in range(page_count):
+        page = doc.new_page()
+        lines = [f"- {i + 1} -"] + (["1.%d Coal and steam" % i] if i % 3 == 0 else [])
+        lines += [f"Line {j} of page {i}. The engine pumped water." for j in range(1 + i % 4)]
+        for row, line in enumerate(lines):
+            page.insert_text((72, 72 + 16 * row), line)
+    doc.save(str(path))
+    return str(path)
+
+
+def test_parallel_pdf_extraction_gives_the_sequential_events(tmp_path):
+    pytest.importorskip("fitz")
+    pdf = make_pdf(tmp_path / "book.pdf", 13)
+    sequential = list(Preprocessor(pdfPath=pdf, workers=1)._extract_pdf_page_ranges())
+    parallel = list(Preprocessor(pdfPath=pdf, workers=3)._extract_pdf_page_ranges())
+    assert len(sequential) == 13
+    assert sequential[4][0] == ("page", 5)
+    assert parallel == sequential
+
+    chunks = [list(Preprocessor(pdfPath=pdf, outputDir=str(tmp_path / str(workers)), chunkSize=30,
+                                workers=workers).iter_chunks()) for workers in (1, 3)]
+    assert chunks[0] and chunks[1] == chunks[0]
+
+
+def test_list_and_stream_apis_give_the_same_chunk_ids(tmp_path):
+    urls = list(PAGES) + ["https://example.org/missing"]
+    preprocessor = Preprocessor(outputDir=str(tmp_path), chunkSize=6, fetcher=PageFetcher())
+    streamed = list(preprocessor.iter_chunks(urls))
+    chunks, metadata = Preprocessor(chunkSize=6, fetcher=PageFetcher()).process_urls(urls)
+
+    assert chunks == [text for text, _ in streamed]
+    assert [meta["chunkId"] for meta in metadata] == [meta["chunkId"] for _, meta in streamed]
+    assert preprocessor.failed_sources == {"https://example.org/missing"}
+    # The repeated sentence gets its own ID instead of colliding with the first one.
+    assert len({meta["chunkId"] for meta in metadata}) == len(metadata)
+
+
+def test_chunk_ids_depend_on_content_not_position():
+    preprocessor = Preprocessor(chunkSize=6, fetcher=PageFetcher())
+    _, first = preprocessor.chunk_and_annotate_text(PAGES["https://example.org/rail"], "https://example.org/rail")
+    _, again = preprocessor.chunk_and_annotate_text(PAGES["https://example.org/rail"], "https://example.org/rail")
+    assert [meta["chunkId"] for meta in first] == [meta["chunkId"] for meta in again]
+    assert first[0]["text"] == "The railway to Kandy was started in 1858."
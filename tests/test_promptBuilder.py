@@ -0,0 +1,63 @@
+from promptBuilder import PromptBuilder, estimate_tokens
+
+
+def pdf_chunk(chunk_id, page, section, text):
+    return {"chunkId": chunk_id, "page": page, "section": section, "source": "book.pdf",
+            "text": f"{section}. {text}"}
+
+
+def test_near_duplicates_are_dropped():
+    items = [
+        pdf_chunk("1", 5, "Coal", "Newcomen built a steam engine to pump water from the coal mines."),
+        pdf_chunk("2", 5, "Coal", "Newcomen built a steam engine to pump water from the coal mines of England."),
+        pdf_chunk("3", 6, "Coal", "Humphry Davy produced the safety lamp in 1812."),
+    ]
+    packed = PromptBuilder().pack(items)
+    assert packed["chunk_ids"] == ["1", "3"]
+    assert packed["duplicates"] == 1
+    assert "of England" not in packed["context"]
+
+
+def test_context_fits_the_token_budget():
+    long_text = " ".join(f"word{i}" for i in range(40))
+    items = [
+        pdf_chunk("1", 1, "A", "Short first chunk."),
+        pdf_chunk("2", 2, "B", long_text),
+        pdf_chunk("3", 3, "C", "Short last chunk."),
+    ]
+    builder = PromptBuilder(token_budget=20)
+    packed = builder.pack(items)
+    # The long chunk is skipped, but a later chunk that fits is still used.
+    assert packed["chunk_ids"] == ["1", "3"]
+    assert packed["over_budget"] == 1
+    assert packed["tokens"] <= builder.token_budget
+
+
+def test_chunks_of_a_section_page_are_merged_in_page_order():
+    items = [
+        pdf_chunk("1", 7, "Railways", "The line reached Kandy in 1867."),
+        {"chunkId": "w", "section": "https://example.org", "source": "https://example.org",
+         "text": "Roads came first."},
+        pdf_chunk("2", 6, "Railways", "Work on the line started in 1858."),
+        pdf_chunk("3", 7, "Railways", "Coffee was carried to Colombo."),
+    ]
+    packed = PromptBuilder().pack(items)
+    assert packed["context"].split("\n") == [
+        "Railways. Work on the line started in 1858.",
+        "Railways. The line reached Kandy in 1867. Coffee was carried to Colombo.",
+        "Roads came first.",
+    ]
+    assert packed["chunk_ids"] == ["1", "w", "2", "3"]
+
+
+def test_tokens_saved_are_reported():
+    items = [
+        pdf_chunk("1", 7, "Railways", "The line reached Kandy in 1867."),
+        pdf_chunk("2", 7, "Railways", "Coffee was carried to Colombo."),
+        pdf_chunk("3", 7, "Railways", "The line reached Kandy in 1867!"),
+    ]
+    packed = PromptBuilder().pack(items)
+    assert packed["original_tokens"] == estimate_tokens("\n".join(item["text"] for item in items))
+    assert packed["tokens"] == estimate_tokens(packed["context"])
+    assert packed["tokens_saved"] == packed["original_tokens"] - packed["tokens"] > 0
+    assert PromptBuilder().pack([])["context"] == ""
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from numpyStore import NumpyCollection
+from quantization import ScalarQuantizer, ProductQuantizer, pq_subspaces, save_quantizer, load_quantizer
+
+
+def clustered_vectors(count, dim=32, clusters=20, seed=0):
+    """Unit vectors around a few centers, like embeddings of a topical corpus."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(clusters, size=count)] + 0.3 * rng.normal(size=(count, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def recall(quantizer, vectors, queries, k, candidates):
+    """Share of the exact top `k` found among the best `candidates` by approximate score."""
+    codes = quantizer.encode(vectors)
+    found = 0
+    for query in queries:
+        exact = set(np.argsort(-(vectors @ query))[:k])
+        approximate = set(np.argsort(-quantizer.scores(codes, query))[:candidates])
+        found += len(exact & approximate)
+    return found / (k * len(queries))
+
+
+@pytest.fixture(scope="module")
+def data():
+    vectors = clustered_vectors(3020)
+    return vectors[:3000], vectors[3000:]
+
+
+def test_int8_scores_match_exact_dot_products(data):
+    vectors, queries = data
+    quantizer = ScalarQuantizer().fit(vectors)
+    codes = quantizer.encode(vectors)
+    assert codes.dtype == np.uint8 and codes.shape == vectors.shape
+    assert np.abs(quantizer.scores(codes, queries[0]) - vectors @ queries[0]).max() < 0.05
+    assert recall(quantizer, vectors, queries, 10, 10) >= 0.9
+
+
+def test_pq_recall_with_reranking_candidates(data):
+    vectors, queries = data
+    # 16 bytes per vector instead of 128; the shortlist is re-ranked exactly by NumpyCollection.
+    quantizer = ProductQuantizer(subspaces=pq_subspaces(32, preferred=16)).fit(vectors)
+    assert quantizer.encode(vectors).shape == (len(vectors), 16)
+    assert recall(quantizer, vectors, queries, 10, 100) >= 0.95
+
+
+@pytest.mark.parametrize("quantizer", [ScalarQuantizer(), ProductQuantizer(subspaces=4, centroids=16)])
+def test_quantizers_survive_save_and_load(data, quantizer, tmp_path):
+    vectors, queries = data
+    quantizer.fit(vectors)
+    save_quantizer(quantizer, str(tmp_path / "quantizer.npz"))
+    loaded = load_quantizer(str(tmp_path / "quantizer.npz"))
+    assert loaded.kind == quantizer.kind and loaded.trained_size == len(vectors)
+    codes = quantizer.encode(vectors)
+    assert np.array_equal(loaded.encode(vectors), codes)
+    assert np.allclose(loaded.scores(codes, queries[0]), quantizer.scores(codes, queries[0]))
+
+
+def test_pq_subspaces_divide_the_dimension():
+    assert pq_subspaces(384) == 48
+    assert pq_subspaces(100) == 25
+    assert pq_subspaces(97) == 1
+
+
+def test_pq_rejects_codes_wider_than_a_byte():
+    with pytest.raises(ValueError):
+        ProductQuantizer(centroids=257)
+    with pytest.raises(ValueError):
+        ProductQuantizer(subspaces=5).fit(np.zeros((10, 32), dtype=np.float32))
+
+
+@pytest.mark.parametrize("compression", ["int8", "pq"])
+def test_compressed_collection_reranks_to_the_exact_top_k(data, compression, tmp_path):
+    vectors, queries = data[0][:1000], data[1]
+    collection = NumpyCollection(str(tmp_path), compression=compression, rerank_factor=8)
+    collection.add(ids=[str(i) for i in range(len(vectors))], embeddings=vectors)
+    assert collection.codes is not None
+    results = collection.query(queries, n_results=5, include=["distances"])
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :5]
+    found = sum(len(set(map(int, ids)) & set(row)) for ids, row in zip(results["ids"], exact))
+    assert found / exact.size >= 0.9
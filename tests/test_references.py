@@ -0,0 +1,36 @@
+from references import ReferenceManager
+
+
+def test_citations_survive_a_restart(tmp_path):
+    path = str(tmp_path / "references.json")
+    manager = ReferenceManager(path)
+    manager.save_references({"sections": ["Coal Industry"], "pages": [5, 6]}, chunk_ids=["a", "b"])
+    manager.save_references({"sections": ["Coal Industry"], "pages": [6]}, chunk_ids=["b"])
+    manager.close()
+
+    reopened = ReferenceManager(path)
+    assert reopened.most_cited_pages(1) == [("6", 2)]
+    assert reopened.most_cited_sections() == [("Coal Industry", 2)]
+    assert reopened.chunks_for_section("Coal Industry") == ["a", "b"]
+    reopened.close()
+
+
+def test_crash_between_snapshot_and_log_truncation_does_not_double_count(tmp_path):
+    path = str(tmp_path / "references.json")
+    manager = ReferenceManager(path)
+    manager.save_references({"sections": ["Railways"], "pages": [9]}, chunk_ids=["c"])
+    manager.close()
+    log = (tmp_path / "references.log").read_text()
+
+    manager = ReferenceManager(path)
+    manager.compact()
+    manager.close()
+    # Put back the log as it was before the truncation, as if the process
+    # had died right after the snapshot was replaced.
+    (tmp_path / "references.log").write_text(log)
+
+    reopened = ReferenceManager(path)
+    assert reopened.most_cited_pages() == [("9", 1)]
+    reopened.save_references({"sections": ["Railways"], "pages": [9]}, chunk_ids=["c"])
+    reopened.close()
+    assert ReferenceManager(path).most_cited_pages() == [("9", 2)]
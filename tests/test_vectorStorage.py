@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+from vectorStorage import VectorStore
+from conftest import FakeEmbedder
+
+
+def make_store(tmp_path):
+    return VectorStore(str(tmp_path / "db"), embedder=FakeEmbedder(), backend="numpy")
+
+
+def test_insert_stream_stores_every_batch(tmp_path):
+    store = make_store(tmp_path)
+    items = ((f"chunk number {i}", {"chunkId": str(i), "source": "book.pdf"}) for i in range(7))
+    assert store.insert_stream(items, batch_size=3) == 7
+    assert sorted(store.ids(), key=int) == [str(i) for i in range(7)]
+    assert [len(texts) for texts, _ in store.embedder.calls] == [3, 3, 1]
+
+    # Upserting the same IDs again replaces them instead of adding rows.
+    items = ((f"chunk number {i} again", {"chunkId": str(i), "source": "book.pdf"}) for i in range(7))
+    assert store.insert_stream(items, batch_size=3) == 7
+    assert store.collection.count() == 7
+    assert store.search("chunk number 4 again", top_k=1)[0]["text"] == "chunk number 4 again"
+
+
+def make_corpus():
+    """Many textbook chunks about steam engines, and a few other chunks the filters single out."""
+    chunks = []
+    for i in range(30):
+        section = ["1.1 Coal", "1.2 Steam", "2.1 Rail"][i % 3]
+        chunks.append((f"The steam engine pumped water, part {i}.", {"page": i, "section": section,
+                                                                      "source": "book.pdf", "source_type": "pdf"}))
+    for i in range(4):
+        chunks.append((f"Tea estates hired workers, part {i}.", {"page": 40 + i, "section": "12.1 Tea",
+                                                                  "source": "book.pdf", "source_type": "pdf"}))
+    for i in range(4):
+        chunks.append((f"Roads reached the coffee hills, site {i}.", {"section": f"https://example.org/{i}",
+                                                                       "source": f"https://example.org/{i}",
+                                                                       "source_type": "web"}))
+    return [text for text, _ in chunks], [{"chunkId": str(i), **meta} for i, (_, meta) in enumerate(chunks)]
+
+
+@pytest.fixture(params=["numpy", "chroma"])
+def corpus_store(request, tmp_path):
+    if request.param == "chroma":
+        pytest.importorskip("chromadb")
+    store = VectorStore(str(tmp_path / "db"), embedder=FakeEmbedder(), backend=request.param)
+    store.insert(*make_corpus())
+    return store
+
+
+def brute_force(store, query, allowed, k):
+    """Squared L2 distances of the best `k` allowed chunks; many chunks tie, so distances are compared, not IDs."""
+    texts, metadata = make_corpus()
+    vectors = store.embedder.encode(texts + [query])
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    distances = np.sum((vectors[:-1] - vectors[-1]) ** 2, axis=1)
+    return sorted(distances[i] for i, meta in enumerate(metadata) if allowed(meta))[:k]
+
+
+@pytest.mark.parametrize("filters, allowed", [
+    ({"source_type": "web"}, lambda meta: meta["source_type"] == "web"),
+    ({"section_prefix": "1."}, lambda meta: meta["section"].startswith("1.")),
+    ({"section_prefix": "12."}, lambda meta: meta["section"].startswith("12.")),
+    ({"pages": (10, 14)}, lambda meta: 10 <= meta.get("page", -1) <= 14),
+    ({"source_type": "pdf", "section_prefix": "2.", "pages": (0, 20)},
+     lambda meta: meta["section"] == "2.1 Rail" and meta["page"] <= 20),
+])
+def test_filtered_search_returns_the_best_k_matches(corpus_store, filters, allowed):
+    _, metadata = make_corpus()
+    for query in ("steam engine pumped water", "tea estates"):
+        results = corpus_store.search(query, top_k=3, **filters)
+        assert all(allowed(metadata[int(item["chunkId"])]) for item in results)
+        assert np.allclose([item["score"] for item in results], brute_force(corpus_store, query, allowed, 3),
+                           atol=1e-4)
+    batched = corpus_store.search_batch(["steam engine pumped water", "tea estates"], top_k=3, **filters)
+    assert [item["chunkId"] for item in batched[1]] == [item["chunkId"] for item in results]
+
+
+def test_filters_with_fewer_matches_than_k(corpus_store):
+    assert len(corpus_store.search("steam engine", top_k=10, source_type="web")) == 4
+    assert corpus_store.search("steam engine", top_k=3, section_prefix="9.") == []
+    assert corpus_store.search("steam engine", top_k=3, source_type="web", pages=(1, 5)) == []
+    assert corpus_store.search_batch(["a", "b"], top_k=3, section_prefix="9.") == [[], []]
+
+
+def test_hybrid_search_stays_in_scope(corpus_store):
+    results = corpus_store.search("steam engine roads", top_k=3, mode="hybrid", source_type="web")
+    assert len(results) == 3
+    assert all(item["source"].startswith("https://") for item in results)
+    assert all("fused_score" in item for item in results)
+
+
+def test_filters_survive_a_restart_and_deletes(tmp_path):
+    store = VectorStore(str(tmp_path / "db"), embedder=FakeEmbedder(), backend="numpy")
+    store.insert(*make_corpus())
+    store.delete(["30", "31"])
+    reopened = VectorStore(str(tmp_path / "db"), embedder=FakeEmbedder(), backend="numpy")
+    assert sorted(item["chunkId"] for item in reopened.search("tea", top_k=5, section_prefix="12.")) == ["32", "33"]
+
+
+def test_hybrid_search_fuses_ranks_and_scores_lexical_only_hits(tmp_path):
+    store = make_store(tmp_path)
+    texts, metadata = make_corpus()
+    store.insert(texts, metadata)
+    # Both rankings put the tea chunks first; after them the lexical index
+    # favours the web chunks ("site") and the dense one a steam chunk.
+    query = "site hired workers steam"
+    dense = store.search(query, top_k=5)
+    lexical = store.lexical_index.search(query, 5)
+
+    expected = {}
+    for rank, item in enumerate(dense):
+        expected[item["chunkId"]] = 1.0 / (10 + rank + 1)
+    for rank, (chunk_id, _) in enumerate(lexical):
+        expected[chunk_id] = expected.get(chunk_id, 0.0) + 2.0 / (10 + rank + 1)
+
+    results = store.search(query, top_k=5, mode="hybrid", lexical_weight=2.0, rrf_k=10, candidates=5)
+    assert [item["fused_score"] for item in results] == \
+        pytest.approx(sorted(expected.values(), reverse=True)[:5])
+    for item in results:
+        assert item["fused_score"] == pytest.approx(expected[item["chunkId"]])
+        assert item["lexical_score"] == pytest.approx(dict(lexical).get(item["chunkId"], 0.0))
+        # Every hit carries its dense distance, also when only the lexical index found it.
+        vectors = store.embedder.encode([texts[int(item["chunkId"])], query])
+        assert item["score"] == pytest.approx(float(((vectors[0] - vectors[1]) ** 2).sum()), abs=1e-4)
+    assert any(item["chunkId"] not in {hit["chunkId"] for hit in dense} for item in results)
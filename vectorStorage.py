@@ -1,69 +1,320 @@
-import os
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict
-
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
-
-class VectorStore:
-    def __init__(self, persist_dir: str = "chroma"):
-        os.makedirs(persist_dir, exist_ok=True)
-        self.client = chromadb.PersistentClient(settings=Settings(persist_directory=persist_dir))
-        self.collection = self.client.get_or_create_collection(name="history_chunks")
-
-    def insert(self, chunks: List[str], metadata: List[Dict]):
-        if len(chunks) != len(metadata):
-            raise ValueError("Chunks and metadata must be the same length.")
-        
-        ids = [str(meta["chunkId"]) for meta in metadata]
-        embeddings = embedder.encode(chunks).tolist()
-
-        self.collection.add(
-            ids=ids,
-            documents=chunks,
-            embeddings=embeddings,
-            metadatas=metadata
-        )
-        print(f"Inserted {len(chunks)} chunks into vector database.")
-
-    def search(self, query: str, top_k: int = 5) -> List[Dict]:
-        query_embedding = embedder.encode([query]).tolist()
-
-        results = self.collection.query(
-            query_embeddings=query_embedding,
-            n_results=top_k,
-            include=["documents", "metadatas", "distances"]
-        )
-
-        formatted = []
-        for i in range(len(results["documents"][0])):
-            formatted.append({
-                "chunkId": results["metadatas"][0][i].get("chunkId"),
-                "page": results["metadatas"][0][i].get("page"),
-                "section": results["metadatas"][0][i].get("section"),
-                "text": results["documents"][0][i],
-                "score": results["distances"][0][i]
-            })
-        return formatted
-
-    def delete(self, chunk_ids: List[int]):
-        str_ids = [str(cid) for cid in chunk_ids]
-        self.collection.delete(ids=str_ids)
-        print(f"🗑️ Deleted chunks: {str_ids}")
-
-    def update(self, chunk_id: int, new_text: str, metadata: Dict):
-        embedding = embedder.encode([new_text]).tolist()
-        self.collection.update(
-            ids=[str(chunk_id)],
-            documents=[new_text],
-            embeddings=embedding,
-            metadatas=[metadata]
-        )
-        print(f"Updated chunk {chunk_id}.")
-
-    def reset(self):
-        self.client.delete_collection("history_chunks")
-        self.collection = self.client.get_or_create_collection(name="history_chunks")
-        print("Reset vector store.")
-
+import os
+import heapq
+import logging
+import numpy as np
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Iterable, Tuple
+from embedder import Embedder
+from lexicalIndex import LexicalIndex
+from metadataIndex import MetadataIndex
+from numpyStore import NumpyCollection
+from chromaClient import get_client, get_collection, reset_collection
+from instrumentation import span, increment
+
+logger = logging.getLogger(__name__)
+
+class VectorStore:
+    def __init__(self, persist_dir: str = "chroma", embedder: Embedder = None, backend: str = "chroma",
+                 dtype: str = "float32", compression: str = None):
+        """
+        `backend` selects where vectors live: "chroma" (a Chroma persistent
+        collection) or "numpy" (a memory-mapped exact-search matrix in
+        `persist_dir`/numpy_store, stored as `dtype`). With the numpy backend,
+        `compression` ("int8", "pq" or "auto") searches quantized codes and
+        re-ranks the best candidates with the exact vectors.
+        """
+        os.makedirs(persist_dir, exist_ok=True)
+        self.persist_dir = persist_dir
+        self.backend = backend
+        self.embedder = embedder or Embedder(cache_path=os.path.join(persist_dir, "embedding_cache.sqlite"))
+        if backend == "chroma":
+            self.client = get_client(persist_dir)
+            self._collection = None
+        elif backend == "numpy":
+            self.client = None
+            self._collection = NumpyCollection(os.path.join(persist_dir, "numpy_store"), dtype=dtype,
+                                              compression=compression)
+        else:
+            raise ValueError(f"Unknown vector store backend: {backend}")
+        self.lexical_index = LexicalIndex(os.path.join(persist_dir, "lexical_index.json"))
+        self.metadata_index = MetadataIndex(os.path.join(persist_dir, "metadata_index.json"))
+
+    @property
+    def collection(self):
+        if self._collection is not None:
+            return self._collection
+        # Looked up on every use, so a reset through any holder of the shared
+        # Chroma collection is seen here too.
+        return get_collection(self.persist_dir, "history_chunks", self.embedder)
+
+    def insert(self, chunks: List[str], metadata: List[Dict]):
+        if len(chunks) != len(metadata):
+            raise ValueError("Chunks and metadata must be the same length.")
+
+        written = self.insert_stream(zip(chunks, metadata), upsert=False)
+        logger.info("Inserted %d chunks into vector database.", written)
+
+    def upsert(self, chunks: List[str], metadata: List[Dict]):
+        if len(chunks) != len(metadata):
+            raise ValueError("Chunks and metadata must be the same length.")
+        if not chunks:
+            return
+
+        written = self.insert_stream(zip(chunks, metadata))
+        logger.info("Upserted %d chunks into vector database.", written)
+
+    def insert_stream(self, items: Iterable[Tuple[str, Dict]], batch_size: int = 256, upsert: bool = True) -> int:
+        """
+        Embed and store (chunk, metadata) pairs in batches of `batch_size`.
+
+        Only one batch of embeddings is held at a time, and batch N+1 is
+        embedded while batch N is being written. Returns the number of items
+        stored.
+        """
+        written = 0
+        pending = None
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            for batch in self._batches(items, batch_size):
+                chunks = [chunk for chunk, _ in batch]
+                metadata = [meta for _, meta in batch]
+                embeddings = self.embedder.encode(chunks).tolist()
+                if pending is not None:
+                    pending.result()
+                pending = writer.submit(self._write_batch, chunks, metadata, embeddings, upsert)
+                written += len(batch)
+            if pending is not None:
+                pending.result()
+
+        self._save_indexes()
+        return written
+
+    @staticmethod
+    def _batches(items, batch_size):
+        iterator = iter(items)
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def _write_batch(self, chunks, metadata, embeddings, upsert):
+        ids = [str(meta["chunkId"]) for meta in metadata]
+        write = self.collection.upsert if upsert else self.collection.add
+        with span("upsert"):
+            write(ids=ids, documents=chunks, embeddings=embeddings, metadatas=metadata)
+            self.lexical_index.add(ids, chunks)
+            self.metadata_index.add(ids, metadata)
+        increment("upserted_chunks", len(ids))
+
+    def _save_indexes(self):
+        self.lexical_index.save()
+        self.metadata_index.save()
+
+    def ids(self, chunk_ids: List[str] = None) -> List[str]:
+        """Return the stored chunk IDs, optionally restricted to `chunk_ids`."""
+        if chunk_ids is not None and not chunk_ids:
+            return []
+        results = self.collection.get(ids=chunk_ids, include=[])
+        return results["ids"]
+
+    def search(self, query: str, top_k: int = 5, mode: str = "dense", dense_weight: float = 1.0,
+               lexical_weight: float = 1.0, rrf_k: int = 60, candidates: int = None, source_type: str = None,
+               section_prefix: str = None, pages: Tuple[int, int] = None) -> List[Dict]:
+        """
+        Return the `top_k` chunks closest to `query`.
+
+        mode="dense" ranks by embedding distance only. mode="hybrid" also runs
+        the BM25 lexical index and merges both rankings with weighted reciprocal
+        rank fusion over `candidates` hits from each (default 4 * top_k).
+        Every result keeps the dense distance in "score"; hybrid results also
+        carry "lexical_score" and "fused_score".
+
+        `source_type` ("pdf" or "web"), `section_prefix` (e.g. "2.") and
+        `pages` (an inclusive (first, last) range) restrict the search to
+        matching chunks inside the store query itself, so up to `top_k`
+        matches are returned whenever that many exist.
+        """
+        if mode not in ("dense", "hybrid"):
+            raise ValueError(f"Unknown search mode: {mode}")
+        with span("search"):
+            scope = self._scope(source_type, section_prefix, pages)
+            if scope is not None and not scope[1]:
+                return []
+            query_embedding = self.embedder.encode([query], use_cache=False)
+            if mode == "dense":
+                return self._dense_search(query_embedding, top_k, scope)
+            return self._hybrid_search(query, query_embedding, top_k, dense_weight, lexical_weight, rrf_k,
+                                       candidates or top_k * 4, scope)
+
+    def search_batch(self, queries: List[str], top_k: int = 5, mode: str = "dense", dense_weight: float = 1.0,
+                     lexical_weight: float = 1.0, rrf_k: int = 60, candidates: int = None, source_type: str = None,
+                     section_prefix: str = None, pages: Tuple[int, int] = None) -> List[List[Dict]]:
+        """
+        Search for many queries with one embedding call and one dense store
+        query; takes the same options as `search`. In hybrid mode the lexical
+        search and rank fusion still run per query.
+        """
+        if mode not in ("dense", "hybrid"):
+            raise ValueError(f"Unknown search mode: {mode}")
+        if not queries:
+            return []
+        scope = self._scope(source_type, section_prefix, pages)
+        if scope is not None and not scope[1]:
+            return [[] for _ in queries]
+        with span("search_batch"):
+            query_embeddings = self.embedder.encode(queries, use_cache=False)
+            if mode == "dense":
+                return self._dense_query(query_embeddings, top_k, scope)
+            candidates = candidates or top_k * 4
+            dense = self._dense_query(query_embeddings, candidates, scope)
+            return [self._hybrid_search(query, query_embeddings[i:i + 1], top_k, dense_weight, lexical_weight, rrf_k,
+                                        candidates, scope, dense=dense[i])
+                    for i, query in enumerate(queries)]
+
+    def _scope(self, source_type, section_prefix, pages):
+        """
+        Resolve search filters through the metadata index into a Chroma
+        `where` clause and the set of matching chunk IDs, or None when there
+        is nothing to filter on.
+        """
+        if source_type is None and section_prefix is None and pages is None:
+            return None
+        if not len(self.metadata_index) and self.collection.count():
+            self.rebuild_indexes()
+
+        clauses = []
+        if source_type is not None:
+            clauses.append({"source": {"$in": self.metadata_index.sources(source_type)}})
+        if section_prefix is not None:
+            clauses.append({"section": {"$in": self.metadata_index.sections(section_prefix)}})
+        if pages is not None:
+            clauses.extend([{"page": {"$gte": pages[0]}}, {"page": {"$lte": pages[1]}}])
+        where = clauses[0] if len(clauses) == 1 else {"$and": clauses}
+        return where, self.metadata_index.matching(source_type, section_prefix, pages)
+
+    def _dense_search(self, query_embedding, top_k: int, scope=None) -> List[Dict]:
+        return self._dense_query(query_embedding, top_k, scope)[0]
+
+    def _dense_query(self, query_embeddings, top_k: int, scope=None) -> List[List[Dict]]:
+        options = {}
+        if scope is not None:
+            # The numpy backend searches the matching rows directly; Chroma
+            # applies the equivalent metadata filter.
+            where, chunk_ids = scope
+            if self.backend == "numpy":
+                options["ids"] = sorted(chunk_ids)
+            else:
+                options["where"] = where
+        with span("search_dense"):
+            results = self.collection.query(
+                query_embeddings=query_embeddings.tolist(),
+                n_results=top_k,
+                include=["documents", "metadatas", "distances"],
+                **options
+            )
+
+        batches = []
+        for q in range(len(results["documents"])):
+            formatted = []
+            for i in range(len(results["documents"][q])):
+                formatted.append(self._format(results["metadatas"][q][i], results["documents"][q][i],
+                                              results["distances"][q][i]))
+            batches.append(formatted)
+        return batches
+
+    @staticmethod
+    def _format(metadata: Dict, document: str, distance: float) -> Dict:
+        return {
+            "chunkId": metadata.get("chunkId"),
+            "page": metadata.get("page"),
+            "section": metadata.get("section"),
+            "source": metadata.get("source"),
+            "text": document,
+            "score": distance
+        }
+
+    def _hybrid_search(self, query, query_embedding, top_k, dense_weight, lexical_weight, rrf_k, candidates,
+                       scope=None, dense=None):
+        if not len(self.lexical_index) and self.collection.count():
+            self.rebuild_lexical_index()
+
+        if dense is None:
+            dense = self._dense_search(query_embedding, candidates, scope)
+        with span("search_lexical"):
+            lexical = self.lexical_index.search(query, candidates, allowed=scope[1] if scope is not None else None)
+
+        fused = {}
+        for rank, item in enumerate(dense):
+            fused[str(item["chunkId"])] = dense_weight / (rrf_k + rank + 1)
+        for rank, (chunk_id, _) in enumerate(lexical):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + lexical_weight / (rrf_k + rank + 1)
+        top = heapq.nlargest(top_k, fused.items(), key=lambda item: item[1])
+
+        by_id = {str(item["chunkId"]): item for item in dense}
+        missing = [chunk_id for chunk_id, _ in top if chunk_id not in by_id]
+        if missing:
+            # Lexical-only hits still get their dense distance so callers can
+            # apply the same distance threshold to every result.
+            results = self.collection.get(ids=missing, include=["documents", "metadatas", "embeddings"])
+            for chunk_id, document, metadata, embedding in zip(results["ids"], results["documents"],
+                                                               results["metadatas"], results["embeddings"]):
+                distance = float(np.sum((np.asarray(embedding, dtype=np.float32) - query_embedding[0]) ** 2))
+                by_id[chunk_id] = self._format(metadata, document, distance)
+
+        lexical_scores = dict(lexical)
+        formatted = []
+        for chunk_id, fused_score in top:
+            if chunk_id in by_id:
+                formatted.append({**by_id[chunk_id], "lexical_score": lexical_scores.get(chunk_id, 0.0),
+                                  "fused_score": fused_score})
+        return formatted
+
+    def rebuild_lexical_index(self):
+        """Rebuild the lexical index from every chunk in the collection."""
+        results = self.collection.get(include=["documents"])
+        self.lexical_index.clear()
+        self.lexical_index.add(results["ids"], results["documents"])
+        self.lexical_index.save()
+
+    def rebuild_indexes(self):
+        """Rebuild the lexical and metadata indexes from every chunk in the collection."""
+        results = self.collection.get(include=["documents", "metadatas"])
+        self.lexical_index.clear()
+        self.lexical_index.add(results["ids"], results["documents"])
+        self.metadata_index.clear()
+        self.metadata_index.add(results["ids"], results["metadatas"])
+        self._save_indexes()
+
+    def delete(self, chunk_ids: List[int]):
+        str_ids = [str(cid) for cid in chunk_ids]
+        self.collection.delete(ids=str_ids)
+        self.lexical_index.remove(str_ids)
+        self.metadata_index.remove(str_ids)
+        self._save_indexes()
+        logger.info("Deleted %d chunks.", len(str_ids))
+        logger.debug("Deleted chunk IDs: %s", str_ids)
+
+    def update(self, chunk_id: int, new_text: str, metadata: Dict):
+        embedding = self.embedder.encode([new_text]).tolist()
+        self.collection.update(
+            ids=[str(chunk_id)],
+            documents=[new_text],
+            embeddings=embedding,
+            metadatas=[metadata]
+        )
+        self.lexical_index.add([str(chunk_id)], [new_text])
+        self.metadata_index.add([str(chunk_id)], [metadata])
+        self._save_indexes()
+        logger.info("Updated chunk %s.", chunk_id)
+
+    def reset(self):
+        if self.backend == "numpy":
+            self.collection.reset()
+        else:
+            reset_collection(self.persist_dir, "history_chunks", self.embedder)
+        self.lexical_index.clear()
+        self.metadata_index.clear()
+        self._save_indexes()
+        logger.info("Reset vector store.")
+